@@ -23,104 +23,288 @@
 # 0 - 3 - 2 - 1: 8,5
 # 0 - 3 - 1 - 2: 8,5
 
-import random
-import copy
+import time
+
+import numpy as np
+
+import localSearch
 
 nr_of_nodes = 4
-nodes_distances = [
+nodes_distances = np.array([
     [0, 3, 2, 2],
     [3, 0, 3, 1.5],
     [2, 3, 0, 1],
     [2, 1.5, 1, 0]
-]
+], dtype=np.float64)
 
 nr_of_ants = 50
 
 pheromones_per_route = 100
 pheromones_excavation = 1     #Loss of pheromones per rpute per iteration
 
-pheromones = [
+pheromones = np.array([
     [0, 1, 1, 1],
     [1, 0, 1, 1],
     [1, 1, 0, 1],
     [1, 1, 1, 0]
-]
+], dtype=np.float64)
 
 start_node = 0
 nr_of_iterations = 50
+max_seconds = None      #Time budget of run_colony, None for no limit
+stagnation_limit = 20   #run_colony stops after that many iterations without a better route, None to always run all iterations
+top_routes = 6          #Number of most often chosen routes reported by run_colony
+
+nr_of_candidates = 20   #Nearest nodes checked first when choosing the next node. Other nodes are checked only when all of them are visited
+candidate_lists = None
+
+local_search_routes = 0     #Number of best routes of every iteration improved with 2-opt/Or-opt (localSearch.py) before pheromones are added
+
+rng = np.random.default_rng()
+
+# Replace the toy graph with any square distance matrix. Pheromones are reset to the initial value on every edge
+# except the self-loops, so the colony can be run on large graphs without editing the literals above.
+# distances may be a list of lists, a NumPy array, a memory-mapped matrix or any other store indexed like a NumPy
+# matrix (see graphLoader.py) - arrays and stores are used as they are, without copying them into memory.
+def setGraph(distances, initial_pheromone=1, pheromones_dtype=np.float64):
+    global nr_of_nodes, nodes_distances, pheromones
+    if not hasattr(distances, "shape"):
+        distances = np.asarray(distances, dtype=np.float64)
+    nodes_distances = distances
+    nr_of_nodes = nodes_distances.shape[0]
+    pheromones = np.full((nr_of_nodes, nr_of_nodes), initial_pheromone, dtype=pheromones_dtype)
+    np.fill_diagonal(pheromones, 0)
+    buildCandidateLists()
+
+# Precompute nr_of_candidates nearest nodes for every node, sorted by distance. Distances are read in chunks of rows,
+# so the whole matrix does not have to be copied at once.
+def buildCandidateLists(chunk_size=256):
+    global candidate_lists
+    k = max(min(nr_of_candidates, nr_of_nodes - 1), 0)
+    candidate_lists = np.empty((nr_of_nodes, k), dtype=np.intp)
+    if k == 0:
+        return candidate_lists
+    for start in range(0, nr_of_nodes, chunk_size):
+        rows = np.array(nodes_distances[start:start + chunk_size], dtype=np.float64)
+        rows[np.arange(len(rows)), np.arange(start, start + len(rows))] = np.inf
+        nearest = np.argpartition(rows, k - 1, axis=1)[:, :k]
+        order = np.argsort(np.take_along_axis(rows, nearest, axis=1), axis=1)
+        candidate_lists[start:start + len(rows)] = np.take_along_axis(nearest, order, axis=1)
+    return candidate_lists
+
+def getCandidateLists():
+    if candidate_lists is None or candidate_lists.shape[0] != nr_of_nodes:
+        buildCandidateLists()
+    return candidate_lists
 
 def getDistance(p1, p2):         #p1, p2 numbers from 0 to 3 (A - D)
-    return nodes_distances[p1][p2]
+    return nodes_distances[p1, p2]
 
+# visited_nodes is a boolean mask of nr_of_nodes elements, True for nodes already on the route
 def getNextAvailableNodes(visited_nodes):
-    return [i for i in range(nr_of_nodes) if i not in visited_nodes]
+    return np.flatnonzero(~visited_nodes)
 
 def getDistances(current_node, next_nodes):
-    return [nodes_distances[current_node][p2] for p2 in next_nodes]
+    return nodes_distances[current_node, next_nodes]
 
 def getPheromones(current_node, next_nodes):
-    return [pheromones[current_node][p2] for p2 in next_nodes]
+    return pheromones[current_node, next_nodes]
 
 def getNextNode(current_node, visited_nodes):
-    next_nodes = getNextAvailableNodes(visited_nodes)  
+    next_nodes = getCandidateLists()[current_node]
+    next_nodes = next_nodes[~visited_nodes[next_nodes]]
+    if len(next_nodes) == 0:
+        next_nodes = getNextAvailableNodes(visited_nodes)
     pheromone_per_route = getPheromones(current_node, next_nodes)
-    next_node = random.choices(next_nodes, pheromone_per_route)
+    if pheromone_per_route.sum() > 0:
+        next_node = rng.choice(next_nodes, p=pheromone_per_route / pheromone_per_route.sum())
+    else:
+        next_node = rng.choice(next_nodes)
     #print(f"Nodes: {next_nodes}, Pher: {pheromone_per_route}, next: {next_node}")
-    return next_node[0]
+    return next_node
 
-def pheromones_excavate():
-    for x in range(nr_of_nodes):
-        for y in range(nr_of_nodes):
-            if pheromones[x][y] > pheromones_excavation:
-                pheromones[x][y] = round(pheromones[x][y] - pheromones_excavation, 1)
+# Cost of closed routes (the last node goes back to the first one). Works for a single route or a (ants x nodes) array.
+def getRoutesCost(routes):
+    return nodes_distances[routes, np.roll(routes, -1, axis=-1)].sum(axis=-1)
+
+# Roulette choice of one column per row of weights. Rows without any positive weight get -1.
+def chooseByWeights(weights):
+    cumulative = np.cumsum(weights, axis=1)
+    total = cumulative[:, -1]
+    threshold = rng.random(weights.shape[0]) * total
+    choice = (cumulative <= threshold[:, None]).sum(axis=1)
+    choice[total <= 0] = -1
+    return np.minimum(choice, weights.shape[1] - 1)
+
+# Roulette choice over all not visited nodes, used only by ants which have all their candidates visited
+def chooseFromAllNodes(current_nodes, visited):
+    next_nodes = chooseByWeights(np.where(visited, 0, pheromones[current_nodes]))
+
+    # All remaining pheromones are zero - choose uniformly among not visited nodes
+    stuck = next_nodes < 0
+    if stuck.any():
+        next_nodes[stuck] = chooseByWeights((~visited[stuck]).astype(np.float64))
+    return next_nodes
+
+# Build routes of all ants at once. Every step is one (ants x candidates) operation: pheromones on the edges to the
+# nearest nodes of the current nodes are masked with the visited nodes and a single roulette pick is done for every ant.
+# Only ants with all candidates already visited fall back to a scan of all nodes.
+def colony_routes(nr_of_ants):
+    ants = np.arange(nr_of_ants)
+    routes = np.empty((nr_of_ants, nr_of_nodes), dtype=np.intp)
+    visited = np.zeros((nr_of_ants, nr_of_nodes), dtype=bool)
+    routes[:, 0] = start_node
+    visited[:, start_node] = True
+    candidates = getCandidateLists()
+
+    for step in range(1, nr_of_nodes):
+        current_nodes = routes[:, step - 1]
+        next_candidates = candidates[current_nodes]
+        weights = np.where(visited[ants[:, None], next_candidates], 0, pheromones[current_nodes[:, None], next_candidates])
+        choice = chooseByWeights(weights)
+        next_nodes = np.where(choice >= 0, next_candidates[ants, np.maximum(choice, 0)], -1)
+
+        full_scan = np.flatnonzero(next_nodes < 0)
+        if len(full_scan):
+            next_nodes[full_scan] = chooseFromAllNodes(current_nodes[full_scan], visited[full_scan])
+
+        routes[:, step] = next_nodes
+        visited[ants, next_nodes] = True
+
+    return routes, getRoutesCost(routes)
 
+# Deposit pheromone_per_path on every edge of route (closed back to the start node). route may be a single route
+# with a single value, or an (ants x nodes) array with one value per ant.
 def pheromones_add(pher, route, pheromone_per_path):
-    for x in range(len(route)):
-        node = route[x]
-        if (route[x] == route[-1]):
-            next_node = start_node
-        else:
-            next_node = route[x + 1]
-        pher[node][next_node] = round(pheromone_per_path + pher[node][next_node], 1)
+    route = np.asarray(route)
+    next_nodes = np.roll(route, -1, axis=-1)
+    per_edge = np.broadcast_to(np.asarray(pheromone_per_path, dtype=np.float64)[..., None], route.shape)
+    np.add.at(pher, (route, next_nodes), per_edge)
+
+def pheromones_excavate():
+    np.subtract(pheromones, pheromones_excavation, out=pheromones, where=pheromones > pheromones_excavation)
 
 def single_ant_route(pher, n):
     current_node = start_node
-    visited_nodes = [current_node]
-    av = getNextAvailableNodes(visited_nodes)
-    total_path = 0
-    while (len(visited_nodes) < nr_of_nodes):
+    visited_nodes = np.zeros(nr_of_nodes, dtype=bool)
+    visited_nodes[current_node] = True
+    route = [current_node]
+    while (len(route) < nr_of_nodes):
         next_node = getNextNode(current_node, visited_nodes)
-        total_path = total_path + getDistance(current_node, next_node)
 
         current_node = next_node
-        visited_nodes.append(current_node)
+        visited_nodes[current_node] = True
+        route.append(current_node)
+
+    route = np.array(route)
+    pheromones_add(pher, route, pheromones_per_route / getRoutesCost(route))
+    return route
+    #print(f"Ant {n} route: {route} phers: {pher}")
+
+# Improve local_search_routes best routes in place with localSearch.py, costs of improved routes are updated
+def improveBestRoutes(routes, costs):
+    best = np.argsort(costs)[:local_search_routes]
+    neighbours = getCandidateLists().tolist()
+    for ant in best:
+        routes[ant] = localSearch.improveRoute(routes[ant], nodes_distances, neighbours, start_node)
+    costs[best] = getRoutesCost(routes[best])
 
-    pheromone_per_path = round((pheromones_per_route / total_path), 1)
-    pheromones_add(pher, visited_nodes, pheromone_per_path)
-    return visited_nodes
-    #print(f"Ant {n} route: {visited_nodes} phers: {pher}")
+# One colony iteration - all ants build their routes, and their pheromones are collected in a single delta matrix
+def colony_iteration():
+    routes, costs = colony_routes(nr_of_ants)
+    if local_search_routes > 0:
+        improveBestRoutes(routes, costs)
+    ant_pher = np.zeros_like(pheromones)
+    if nr_of_nodes < 2:     #A route through one node has no edges and costs 0 - nothing to deposit, no division by 0
+        return routes, costs, ant_pher
+    pheromones_add(ant_pher, routes, pheromones_per_route / costs)
+    return routes, costs, ant_pher
 
+# ant_pher is a delta matrix (or a stack of them) with pheromones left by ants in the current iteration
 def sum_pheromones(ant_pher):
-    for pher in ant_pher:
-        for x in range(nr_of_nodes):
-            for y in range(nr_of_nodes):
-                pheromones[x][y] += pher[x][y]
+    ant_pher = np.asarray(ant_pher)
+    if ant_pher.ndim == 3:
+        ant_pher = ant_pher.sum(axis=0)
+    np.add(pheromones, ant_pher, out=pheromones)
+
+# Bounded counter of the most often chosen routes (Space-Saving algorithm). When capacity routes are already counted,
+# the least counted one is replaced by the new route, which inherits its count - so frequent routes are never
+# undercounted, and memory does not grow with the number of distinct routes.
+def countRoute(counters, key, count, capacity):
+    if key in counters:
+        counters[key] += count
+    elif len(counters) < capacity:
+        counters[key] = count
+    else:
+        least = min(counters, key=counters.get)
+        counters[key] = counters.pop(least) + count
+
+# Run the colony until nr_of_iterations, max_seconds or stagnation_limit iterations without a better route.
+# The best route is tracked incrementally, and only the top_routes most often chosen routes are counted.
+# Per-iteration timing and route cost statistics are kept in the returned history (and printed with verbose).
+def run_colony(nr_of_iterations=nr_of_iterations, max_seconds=max_seconds, stagnation_limit=stagnation_limit,
+               top_routes=top_routes, verbose=True):
+    run_start = time.perf_counter()
+    best_route, best_cost = None, np.inf
+    counters = dict()
+    stagnation = 0
+    stop_reason = "iterations"
+    history = list()
 
-if __name__ == "__main__":
-    print("AlgorytmMrowkowy:")
-    paths = dict()
     for it in range(nr_of_iterations):
-        ant_pher = [copy.deepcopy(pheromones) for ant in range(nr_of_ants)]
-        for ant in range(nr_of_ants):
-            route = single_ant_route(ant_pher[ant], ant)
-            key = " ".join(str (e) for e in route)
-            if key not in paths:
-                paths[key] = 1
-            else:
-                paths[key] += 1
+        iteration_start = time.perf_counter()
+        routes, costs, ant_pher = colony_iteration()
         sum_pheromones(ant_pher)
         pheromones_excavate()
-        print(f"Pheromones updated: {pheromones}")
-    
-    print(paths)
 
+        best = np.argmin(costs)
+        if costs[best] < best_cost:
+            best_route, best_cost = routes[best].copy(), costs[best]
+            stagnation = 0
+        else:
+            stagnation += 1
+
+        unique_routes, counts = np.unique(routes, axis=0, return_counts=True)
+        for route, count in zip(unique_routes, counts):
+            countRoute(counters, route.tobytes(), int(count), 10 * top_routes)
+
+        now = time.perf_counter()
+        stats = {
+            "iteration": it + 1,
+            "seconds": now - iteration_start,
+            "best_cost": float(costs[best]),
+            "mean_cost": float(costs.mean()),
+            "worst_cost": float(costs.max()),
+            "std_cost": float(costs.std()),
+        }
+        history.append(stats)
+        if verbose:
+            print(f"Iteration {it + 1}: {stats['seconds'] * 1000:.1f} ms, cost best {stats['best_cost']:.2f} "
+                  f"mean {stats['mean_cost']:.2f} worst {stats['worst_cost']:.2f} std {stats['std_cost']:.2f}, "
+                  f"best so far {best_cost:.2f}")
+
+        if stagnation_limit is not None and stagnation >= stagnation_limit:
+            stop_reason = "stagnation"
+            break
+        if max_seconds is not None and now - run_start >= max_seconds:
+            stop_reason = "time"
+            break
+
+    most_chosen = sorted(counters.items(), key=lambda item: item[1], reverse=True)[:top_routes]
+    return {
+        "best_route": best_route,
+        "best_cost": best_cost,
+        "iterations": len(history),
+        "seconds": time.perf_counter() - run_start,
+        "stop_reason": stop_reason,
+        "top_routes": [(np.frombuffer(key, dtype=np.intp), count) for key, count in most_chosen],
+        "history": history,
+    }
+
+if __name__ == "__main__":
+    print("AlgorytmMrowkowy:")
+    result = run_colony()
+    print(f"Stopped after {result['iterations']} iterations ({result['stop_reason']}) in {result['seconds']:.2f} s")
+    print(f"Best route: {result['best_route']}, cost: {result['best_cost']}")
+    for route, count in result["top_routes"]:
+        print(f"{' '.join(str(node) for node in route)}: {count}")
@@ -0,0 +1,218 @@
+#!/usr/bin/python3
+
+# Graph loader for the Ant Algorithm
+# Large graphs do not fit in a list of lists - a 20000 nodes graph has 400M distances. This module loads graphs from
+# files and keeps distances in one of two backing stores, both readable by the colony in algorytmMrowkowy.py with the
+# same indexing as a NumPy matrix (nodes_distances[p1, p2], nodes_distances[p1, next_nodes], nodes_distances[rows]):
+# - CoordinateDistances - only node coordinates are kept, distances are computed on demand,
+# - memory-mapped float32 matrix in a .npy file on disk, filled in chunks of rows.
+#
+# Supported files:
+# - TSPLIB problems (https://comopt.ifi.uni-heidelberg.de/software/TSPLIB95/) with NODE_COORD_SECTION
+#   (EUC_2D, EUC_3D, CEIL_2D, ATT, GEO) or EDGE_WEIGHT_SECTION (EXPLICIT, FULL_MATRIX, UPPER_ROW, LOWER_ROW,
+#   UPPER_DIAG_ROW, LOWER_DIAG_ROW),
+# - plain coordinates files, one "x y" line per node, with euclidean distances.
+
+import sys
+from itertools import islice
+
+import numpy as np
+
+import algorytmMrowkowy as am
+
+def euclideanDistance(a, b):
+    return np.sqrt(((a - b) ** 2).sum(axis=-1))
+
+def tsplibEuclideanDistance(a, b):
+    return np.floor(euclideanDistance(a, b) + 0.5)
+
+def tsplibCeilDistance(a, b):
+    return np.ceil(euclideanDistance(a, b))
+
+def tsplibAttDistance(a, b):
+    r = np.sqrt(((a - b) ** 2).sum(axis=-1) / 10.0)
+    t = np.floor(r + 0.5)
+    return np.where(t < r, t + 1, t)
+
+def tsplibGeoDistance(a, b):
+    # Coordinates are given as DDD.MM (degrees and minutes)
+    def toRadians(x):
+        degrees = np.trunc(x)
+        return np.pi * (degrees + 5.0 * (x - degrees) / 3.0) / 180.0
+    lat_a, lon_a = toRadians(a[..., 0]), toRadians(a[..., 1])
+    lat_b, lon_b = toRadians(b[..., 0]), toRadians(b[..., 1])
+    q1 = np.cos(lon_a - lon_b)
+    q2 = np.cos(lat_a - lat_b)
+    q3 = np.cos(lat_a + lat_b)
+    distance = np.trunc(6378.388 * np.arccos(np.clip(0.5 * ((1.0 + q1) * q2 - (1.0 - q1) * q3), -1, 1)) + 1.0)
+    # Distance of a node to itself is 0, not the +1 from the TSPLIB rounding
+    return np.where((a == b).all(axis=-1), 0.0, distance)
+
+distance_metrics = {
+    "EUCLIDEAN": euclideanDistance,
+    "EUC_2D": tsplibEuclideanDistance,
+    "EUC_3D": tsplibEuclideanDistance,
+    "CEIL_2D": tsplibCeilDistance,
+    "ATT": tsplibAttDistance,
+    "GEO": tsplibGeoDistance,
+}
+
+# Distances computed on demand from node coordinates. Indexing follows NumPy rules:
+# - distances[rows] gives full rows (rows may be an int, a slice or an array of nodes),
+# - distances[p1, p2] gives distances between pairs of nodes, p1 and p2 are broadcasted like NumPy index arrays.
+class CoordinateDistances():
+
+    def __init__(self, coords, metric="EUCLIDEAN") -> None:
+        if metric not in distance_metrics:
+            raise ValueError(f"Unsupported distance metric: {metric}")
+        self.coords = np.ascontiguousarray(coords, dtype=np.float64)
+        self.metric = metric
+        self.distance_function = distance_metrics[metric]
+        self.shape = (len(self.coords), len(self.coords))
+        self.dtype = np.dtype(np.float64)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, key):
+        if isinstance(key, tuple):
+            rows, cols = key
+            if isinstance(rows, slice) or isinstance(cols, slice):
+                return self[rows][..., cols]
+            return self.distance_function(self.coords[rows], self.coords[cols])
+        rows = self.coords[key]
+        return self.distance_function(rows[..., None, :], self.coords)
+
+# Read the "KEY : VALUE" specification part of a TSPLIB file, up to the first data section
+def readTsplibSpecification(lines):
+    specification = dict()
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if ":" in line:
+            key, value = line.split(":", 1)
+            specification[key.strip().upper()] = value.strip()
+        else:
+            specification["SECTION"] = line.upper()
+            break
+    return specification
+
+# Stream numbers from the explicit EDGE_WEIGHT_SECTION into the rows of the matrix. Only the triangle given by the
+# format is read, the other one is mirrored afterwards in square blocks, so the matrix is never fully in RAM.
+def readExplicitWeights(lines, matrix, weight_format, chunk_size=1024):
+    n = matrix.shape[0]
+    row_columns = {
+        "FULL_MATRIX": lambda i: (0, n),
+        "UPPER_ROW": lambda i: (i + 1, n),
+        "LOWER_ROW": lambda i: (0, i),
+        "UPPER_DIAG_ROW": lambda i: (i, n),
+        "LOWER_DIAG_ROW": lambda i: (0, i + 1),
+    }
+    if weight_format not in row_columns:
+        raise ValueError(f"Unsupported EDGE_WEIGHT_FORMAT: {weight_format}")
+
+    # Numbers read but not placed yet are kept as a list of arrays and joined once per row - a row may be wrapped
+    # over many short lines
+    pending = list()
+    available = 0
+    row = 0
+    for line in lines:
+        if row >= n or line.strip().upper() in ("EOF", "DISPLAY_DATA_SECTION"):
+            break
+        values = np.array(line.split(), dtype=np.float64)
+        pending.append(values)
+        available += len(values)
+        while row < n:
+            first, last = row_columns[weight_format](row)
+            if available < last - first:
+                break
+            numbers = np.concatenate(pending) if len(pending) > 1 else pending[0]
+            matrix[row, first:last] = numbers[:last - first]
+            pending = [numbers[last - first:]]
+            available -= last - first
+            row += 1
+    if row < n:
+        raise ValueError(f"EDGE_WEIGHT_SECTION ended after {row} of {n} rows")
+
+    if weight_format != "FULL_MATRIX":
+        # Missing triangle is below the diagonal for UPPER_* formats and above it for LOWER_* formats
+        upper = weight_format.startswith("UPPER")
+        for row_start in range(0, n, chunk_size):
+            rows = slice(row_start, min(row_start + chunk_size, n))
+            col_starts = range(0, row_start + 1, chunk_size) if upper else range(row_start, n, chunk_size)
+            for col_start in col_starts:
+                cols = slice(col_start, min(col_start + chunk_size, n))
+                row_ids = np.arange(rows.start, rows.stop)[:, None]
+                col_ids = np.arange(cols.start, cols.stop)[None, :]
+                missing = row_ids > col_ids if upper else row_ids < col_ids
+                matrix[rows, cols] = np.where(missing, np.array(matrix[cols, rows]).T, matrix[rows, cols])
+        for i in range(n):
+            matrix[i, i] = 0
+    return matrix
+
+# Matrix for explicit distances - memory mapped .npy file on disk, or a regular array when no file is given
+def allocateDistanceMatrix(n, matrix_file=None):
+    if matrix_file is None:
+        return np.zeros((n, n), dtype=np.float32)
+    return np.lib.format.open_memmap(matrix_file, mode="w+", dtype=np.float32, shape=(n, n))
+
+# Compute all distances of a CoordinateDistances store, in chunks of rows, into a memory mapped .npy file
+def writeDistanceMatrix(matrix_file, distances, chunk_size=256):
+    matrix = allocateDistanceMatrix(len(distances), matrix_file)
+    for start in range(0, len(distances), chunk_size):
+        matrix[start:start + chunk_size] = distances[start:start + chunk_size]
+    matrix.flush()
+    return openDistanceMatrix(matrix_file)
+
+# Open a matrix written before by writeDistanceMatrix/loadGraph, without reading it into memory
+def openDistanceMatrix(matrix_file):
+    return np.load(matrix_file, mmap_mode="r")
+
+def loadTsplib(path, matrix_file=None):
+    with open(path) as f:
+        specification = readTsplibSpecification(f)
+        n = int(specification["DIMENSION"])
+        section = specification.get("SECTION")
+        weight_type = specification.get("EDGE_WEIGHT_TYPE", "EUC_2D").upper()
+
+        if section == "NODE_COORD_SECTION":
+            coords = np.array([line.split()[1:] for line in islice(f, n)], dtype=np.float64)
+            distances = CoordinateDistances(coords, weight_type)
+            return writeDistanceMatrix(matrix_file, distances) if matrix_file else distances
+
+        if section == "EDGE_WEIGHT_SECTION" and weight_type == "EXPLICIT":
+            matrix = allocateDistanceMatrix(n, matrix_file)
+            readExplicitWeights(f, matrix, specification.get("EDGE_WEIGHT_FORMAT", "FULL_MATRIX").upper())
+            if matrix_file:
+                matrix.flush()
+                return openDistanceMatrix(matrix_file)
+            return matrix
+
+    raise ValueError(f"Unsupported TSPLIB problem: section {section}, EDGE_WEIGHT_TYPE {weight_type}")
+
+def loadCoordinates(path, matrix_file=None):
+    distances = CoordinateDistances(np.loadtxt(path, ndmin=2))
+    return writeDistanceMatrix(matrix_file, distances) if matrix_file else distances
+
+# Load a graph from a TSPLIB or a plain coordinates file. With matrix_file all distances are stored in a memory mapped
+# float32 matrix, otherwise coordinates graphs compute distances on demand.
+def loadGraph(path, matrix_file=None):
+    with open(path) as f:
+        first_line = f.readline()
+    if ":" in first_line or first_line.strip().upper().endswith("_SECTION"):
+        return loadTsplib(path, matrix_file)
+    return loadCoordinates(path, matrix_file)
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(f"Usage: {sys.argv[0]} graph_file [matrix_file.npy]")
+        sys.exit(1)
+
+    distances = loadGraph(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    am.setGraph(distances, pheromones_dtype=np.float32)
+    am.local_search_routes = 3
+    print(f"Loaded graph with {am.nr_of_nodes} nodes from {sys.argv[1]}")
+    result = am.run_colony()
+    print(f"Stopped after {result['iterations']} iterations ({result['stop_reason']}) in {result['seconds']:.2f} s")
+    print(f"Best cost: {result['best_cost']}")
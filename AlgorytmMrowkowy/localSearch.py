@@ -0,0 +1,138 @@
+#!/usr/bin/python3
+
+# Local search for ant routes
+# Routes built by ants are random walks guided by pheromones, so even good routes usually have a few crossing edges
+# or single nodes visited "on the way back". A cheap local search fixes such routes before pheromones are added,
+# so the colony learns from better routes and needs far less iterations on big graphs.
+#
+# Two moves are used, both only look at the nearest neighbours of a node (candidate lists):
+# - 2-opt - remove two edges (a, b), (c, d) and reconnect the route as (a, c), (b, d), reversing the part between,
+# - Or-opt - move a segment of 1 to or_opt_segment nodes between two other neighbouring nodes, in any direction.
+# Every node has a "don't look" bit - a node is checked again only when one of its edges was changed by a move.
+# Distances are expected to be symmetric.
+
+from collections import deque
+
+import numpy as np
+
+or_opt_segment = 3
+epsilon = 1e-9
+
+def getDistance(distances, p1, p2):
+    return float(distances[p1, p2])
+
+# Reverse the part of the route from position i to position j (going forward, around the end if needed). For a closed
+# route this is the same as reversing the rest of it, so the shorter part is reversed.
+def reverseSegment(tour, pos, i, j):
+    n = len(tour)
+    length = (j - i) % n + 1
+    if 2 * length > n:
+        i, j = (j + 1) % n, (i - 1) % n
+        length = n - length
+    for k in range(length // 2):
+        p1, p2 = (i + k) % n, (j - k) % n
+        tour[p1], tour[p2] = tour[p2], tour[p1]
+        pos[tour[p1]] = p1
+        pos[tour[p2]] = p2
+
+# Try the 2-opt moves for both edges of node a. Returns nodes with changed edges, or None when no move improves the route.
+def twoOptMove(tour, pos, a, distances, neighbours):
+    n = len(tour)
+    for direction in (1, -1):
+        b = tour[(pos[a] + direction) % n]
+        d_ab = getDistance(distances, a, b)
+        for c in neighbours[a]:
+            d_ac = getDistance(distances, a, c)
+            if d_ac >= d_ab:
+                break
+            d = tour[(pos[c] + direction) % n]
+            if c == b or d == a:
+                continue
+            if d_ab + getDistance(distances, c, d) - d_ac - getDistance(distances, b, d) > epsilon:
+                if direction == 1:
+                    reverseSegment(tour, pos, pos[b], pos[c])
+                else:
+                    reverseSegment(tour, pos, pos[a], pos[d])
+                return (a, b, c, d)
+    return None
+
+# Try to move the segments starting at node a next to one of the neighbours of the segment ends.
+# Returns nodes with changed edges, or None when no move improves the route.
+def orOptMove(tour, pos, a, distances, neighbours):
+    n = len(tour)
+    for length in range(1, min(or_opt_segment, n - 3) + 1):
+        i = pos[a]
+        segment = [tour[(i + k) % n] for k in range(length)]
+        first, last = segment[0], segment[-1]
+        prev_node, next_node = tour[(i - 1) % n], tour[(i + length) % n]
+        removal_gain = (getDistance(distances, prev_node, first) + getDistance(distances, last, next_node)
+                        - getDistance(distances, prev_node, next_node))
+        if removal_gain <= epsilon:
+            continue
+
+        in_segment = set(segment)
+        for end, other_end in ((first, last), (last, first)):
+            for c in neighbours[end]:
+                if c in in_segment:
+                    continue
+                d_c_end = getDistance(distances, c, end)
+                if d_c_end >= removal_gain:
+                    break
+                for e in (tour[(pos[c] + 1) % n], tour[(pos[c] - 1) % n]):
+                    if e in in_segment:
+                        continue
+                    # New route goes c, end ... other_end, e
+                    insertion_cost = d_c_end + getDistance(distances, other_end, e) - getDistance(distances, c, e)
+                    if removal_gain - insertion_cost > epsilon:
+                        moveSegment(tour, pos, i, length, c, e, end == first)
+                        return (prev_node, next_node, first, last, c, e)
+    return None
+
+# Move the segment of length nodes at position i between nodes c and e, with the segment start next to c when
+# start_next_to_c is set.
+def moveSegment(tour, pos, i, length, c, e, start_next_to_c):
+    n = len(tour)
+    segment = [tour[(i + k) % n] for k in range(length)]
+    rest = [tour[(i + length + k) % n] for k in range(n - length)]
+    c_pos = rest.index(c)
+    if rest[(c_pos + 1) % len(rest)] == e:
+        rest[c_pos + 1:c_pos + 1] = segment if start_next_to_c else segment[::-1]
+    else:
+        rest[c_pos:c_pos] = segment[::-1] if start_next_to_c else segment
+    tour[:] = rest
+    for position, node in enumerate(tour):
+        pos[node] = position
+
+# Improve a closed route with 2-opt and Or-opt moves until no move helps. neighbours are candidate lists (lists of
+# nearest nodes sorted by distance) for every node. The returned route starts at start_node (or at the same node as
+# the input route).
+def improveRoute(route, distances, neighbours, start_node=None, use_or_opt=True):
+    tour = [int(node) for node in route]
+    n = len(tour)
+    if start_node is None:
+        start_node = tour[0]
+    if n < 4:
+        return np.array(tour)
+
+    pos = [0] * n
+    for position, node in enumerate(tour):
+        pos[node] = position
+
+    # Nodes in the queue have their "don't look" bit cleared
+    queued = [True] * n
+    active = deque(tour)
+    while active:
+        a = active.popleft()
+        queued[a] = False
+        changed = twoOptMove(tour, pos, a, distances, neighbours)
+        if changed is None and use_or_opt:
+            changed = orOptMove(tour, pos, a, distances, neighbours)
+        if changed is None:
+            continue
+        for node in changed:
+            if not queued[node]:
+                queued[node] = True
+                active.append(node)
+
+    start = pos[start_node]
+    return np.array(tour[start:] + tour[:start])
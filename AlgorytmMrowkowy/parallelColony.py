@@ -0,0 +1,149 @@
+#!/usr/bin/python3
+
+# Parallel Ant Algorithm
+# Every ant only reads the shared pheromones matrix and writes its own pheromones, so ants (and whole colonies) can run
+# independently on all cores. Here each worker process runs its own colony of ants_per_worker ants for merge_interval
+# iterations, starting from the common pheromones matrix. After that the pheromones left by all colonies are merged
+# into the common matrix and the next round starts from it.
+#
+# Big matrices are never pickled between processes:
+# - distances and the common pheromones matrix live in shared memory, workers attach to them once at start-up
+#   (memory-mapped distances are opened from their file and coordinate graphs share only coordinates, see graphLoader.py),
+# - every task writes the pheromones it left into its own shared memory block, which is summed by the main process.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import algorytmMrowkowy as am
+import graphLoader
+
+nr_of_workers = os.cpu_count()
+ants_per_worker = am.nr_of_ants
+merge_interval = 5      # Local colony iterations between pheromones merges
+nr_of_merges = 10
+
+# Shared memory blocks attached in a worker process, keyed by name
+_worker_blocks = dict()
+
+def createSharedArray(array):
+    shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+    view = np.ndarray(array.shape, dtype=array.dtype, buffer=shm.buf)
+    view[:] = array
+    return shm, view
+
+def attachSharedArray(spec):
+    name, shape, dtype = spec
+    shm = _worker_blocks.get(name)
+    if shm is None:
+        shm = shared_memory.SharedMemory(name=name)
+        _worker_blocks[name] = shm
+    return np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+def sharedSpec(shm, array):
+    return (shm.name, array.shape, array.dtype.str)
+
+# Describe the distances store of the main process, so workers can open the same store without pickling the matrix.
+# New shared memory blocks are appended to blocks.
+def shareDistances(distances, blocks):
+    if isinstance(distances, np.memmap):
+        return ("memmap", distances.filename)
+    if isinstance(distances, graphLoader.CoordinateDistances):
+        shm, coords = createSharedArray(distances.coords)
+        blocks.append(shm)
+        return ("coordinates", sharedSpec(shm, coords), distances.metric)
+    shm, matrix = createSharedArray(np.ascontiguousarray(distances))
+    blocks.append(shm)
+    return ("array", sharedSpec(shm, matrix))
+
+def attachDistances(distances_spec):
+    kind = distances_spec[0]
+    if kind == "memmap":
+        return graphLoader.openDistanceMatrix(distances_spec[1])
+    if kind == "coordinates":
+        return graphLoader.CoordinateDistances(attachSharedArray(distances_spec[1]), distances_spec[2])
+    return attachSharedArray(distances_spec[1])
+
+# Process pool initializer - attach the distances and copy the colony settings from the main process
+def initWorker(distances_spec, settings):
+    am.nodes_distances = attachDistances(distances_spec)
+    am.nr_of_nodes = am.nodes_distances.shape[0]
+    (am.start_node, am.pheromones_per_route, am.pheromones_excavation,
+     am.nr_of_candidates, am.local_search_routes) = settings
+
+# Single task: run a local colony for nr_of_iterations iterations, starting from the common pheromones.
+# Pheromones left by the ants are summed into the task's delta block, the best route found is returned.
+def colony_worker(pheromones_spec, delta_spec, seed, nr_of_ants, nr_of_iterations):
+    am.rng = np.random.default_rng(seed)
+    am.nr_of_ants = nr_of_ants
+    am.pheromones = attachSharedArray(pheromones_spec).copy()
+    delta = attachSharedArray(delta_spec)
+    delta[:] = 0
+
+    best_route, best_cost = None, np.inf
+    for it in range(nr_of_iterations):
+        routes, costs, ant_pher = am.colony_iteration()
+        am.sum_pheromones(ant_pher)
+        am.pheromones_excavate()
+        np.add(delta, ant_pher, out=delta)
+
+        best = np.argmin(costs)
+        if costs[best] < best_cost:
+            best_route, best_cost = routes[best].copy(), costs[best]
+
+    return best_route, best_cost
+
+# Run nr_of_merges rounds of nr_of_workers parallel colonies. Merged pheromones are written to am.pheromones.
+def run_parallel(nr_of_workers=nr_of_workers, ants_per_worker=ants_per_worker, merge_interval=merge_interval,
+                 nr_of_merges=nr_of_merges, seed=None):
+    seeds = np.random.SeedSequence(seed)
+    blocks = list()
+    pheromones_shm = None
+    try:
+        distances_spec = shareDistances(am.nodes_distances, blocks)
+        pheromones_shm, pheromones = createSharedArray(am.pheromones)
+        blocks.append(pheromones_shm)
+        deltas = list()
+        for worker in range(nr_of_workers):
+            delta_shm, delta = createSharedArray(np.zeros_like(pheromones))
+            blocks.append(delta_shm)
+            deltas.append((sharedSpec(delta_shm, delta), delta))
+
+        # Main process works on the shared pheromones directly, so workers see every merge
+        am.pheromones = pheromones
+        settings = (am.start_node, am.pheromones_per_route, am.pheromones_excavation,
+                    am.nr_of_candidates, am.local_search_routes)
+
+        best_route, best_cost = None, np.inf
+        with ProcessPoolExecutor(max_workers=nr_of_workers, initializer=initWorker,
+                                 initargs=(distances_spec, settings)) as executor:
+            for merge in range(nr_of_merges):
+                tasks = [executor.submit(colony_worker, sharedSpec(pheromones_shm, pheromones), delta_spec,
+                                         task_seed, ants_per_worker, merge_interval)
+                         for (delta_spec, delta), task_seed in zip(deltas, seeds.spawn(nr_of_workers))]
+                for task in tasks:
+                    route, cost = task.result()
+                    if cost < best_cost:
+                        best_route, best_cost = route, cost
+
+                for delta_spec, delta in deltas:
+                    am.sum_pheromones(delta)
+                for it in range(merge_interval):
+                    am.pheromones_excavate()
+                print(f"Merge {merge + 1}/{nr_of_merges}: best cost {best_cost}")
+
+        return best_route, best_cost
+    finally:
+        # Shared blocks are released below, keep the merged pheromones in a regular array
+        if pheromones_shm in blocks and am.pheromones is pheromones:
+            am.pheromones = pheromones.copy()
+        for shm in blocks:
+            shm.close()
+            shm.unlink()
+
+if __name__ == "__main__":
+    print("AlgorytmMrowkowy - parallel colonies:")
+    route, cost = run_parallel()
+    print(f"Best route: {route}, cost: {cost}")
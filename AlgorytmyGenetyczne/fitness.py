@@ -0,0 +1,86 @@
+#!/usr/bin/python3
+
+# Fitness evaluation for genetic algorithms
+# In real problems the fit function is the expensive part of the algorithm (a simulation, a model training...), and
+# the same chromosomes show up again and again - selected parents are copied many times, and children are often
+# the same as their parents. FitnessEvaluator evaluates every chromosome only once:
+# - duplicates in a generation are evaluated once (batch evaluation of unique genotypes),
+# - fitness of already seen genotypes is taken from a bounded LRU cache keyed by the genotype bits,
+# - only unseen genotypes are passed to the fit function, optionally split into chunks over a process pool.
+#
+# fit_function takes an (M x W) array of genotypes (rows of the packed bit matrix from genetic_numpy.py) and returns
+# M fitness values. With a process pool it has to be a module-level function, so it can be pickled.
+
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+class FitnessEvaluator():
+
+    def __init__(self, fit_function, cache_size=100000, nr_of_workers=0, chunks_per_worker=4) -> None:
+        self.fit_function = fit_function
+        self.cache_size = cache_size
+        self.nr_of_workers = nr_of_workers if nr_of_workers is not None else os.cpu_count()
+        self.chunks_per_worker = chunks_per_worker
+        self.cache = OrderedDict()
+        self.executor = None
+        self.hits = 0
+        self.evaluations = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+
+    # Fitness of every chromosome of pop
+    def evaluate(self, pop):
+        unique, inverse = np.unique(pop, axis=0, return_inverse=True)
+        unique_fitness = np.empty(len(unique), dtype=np.float64)
+
+        if self.cache_size > 0:
+            keys = [genotype.tobytes() for genotype in unique]
+            missing = list()
+            for i, key in enumerate(keys):
+                value = self.cache.get(key)
+                if value is None:
+                    missing.append(i)
+                else:
+                    self.cache.move_to_end(key)
+                    unique_fitness[i] = value
+            self.hits += len(unique) - len(missing)
+        else:
+            missing = np.arange(len(unique))
+
+        if len(missing):
+            missing_fitness = self.evaluate_batch(unique[missing])
+            unique_fitness[missing] = missing_fitness
+            if self.cache_size > 0:
+                self.store(keys, missing, missing_fitness)
+
+        return unique_fitness[inverse.reshape(-1)]
+
+    # Evaluate genotypes with the fit function, in the current process or split over the process pool
+    def evaluate_batch(self, genotypes):
+        self.evaluations += len(genotypes)
+        if self.nr_of_workers <= 1 or len(genotypes) < self.nr_of_workers:
+            return np.asarray(self.fit_function(genotypes), dtype=np.float64)
+
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(max_workers=self.nr_of_workers)
+        chunks = [chunk for chunk in np.array_split(genotypes, self.nr_of_workers * self.chunks_per_worker) if len(chunk)]
+        return np.concatenate([np.asarray(result, dtype=np.float64)
+                               for result in self.executor.map(self.fit_function, chunks)])
+
+    def store(self, keys, indices, values):
+        for i, value in zip(indices, values):
+            self.cache[keys[i]] = float(value)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
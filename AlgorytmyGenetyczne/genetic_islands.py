@@ -0,0 +1,125 @@
+#!/usr/bin/python3
+
+# Island model of the genetic algorithm
+# Instead of one big population, nr_of_islands smaller populations (islands) evolve independently in separate
+# processes, with the same selection / crossover / mutation operators as in genetic_numpy.py. Every
+# migration_interval generations islands exchange their best chromosomes - migrants sent along the migration topology
+# replace the worst chromosomes of the receiving island. Islands keep more diversity than one population
+# (each island explores its own part of the search space), and every island uses its own CPU core.
+#
+# Migration topologies:
+# - ring - island i sends migrants to island i + 1,
+# - full - every island sends migrants to all other islands,
+# - random - every island sends migrants to one random other island, chosen again at every migration.
+#
+# The run ends when stop_function succeeds on any island (global stop condition), or after max_epochs migrations.
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import genetic_numpy as gn
+from fitness import FitnessEvaluator
+
+nr_of_islands = os.cpu_count()
+island_size = 1000
+migration_interval = 5
+migrants = 2
+topology = "ring"
+max_epochs = 100
+
+# Fitness evaluators of a worker process, one per fit function
+_evaluators = dict()
+
+def getEvaluator(fit_function):
+    if fit_function not in _evaluators:
+        _evaluators[fit_function] = FitnessEvaluator(fit_function)
+    return _evaluators[fit_function]
+
+# Single task: evolve one island for up to generations generations, or until stop_function succeeds.
+# settings are the genetic_numpy settings of the main process.
+def evolve_island(pop, seed, generations, bits, fit_function, stop_function, settings):
+    gn.rng = np.random.default_rng(seed)
+    gn.mutation_probability, gn.selection_method, gn.tournament_size, gn.max_value = settings
+    evaluator = getEvaluator(fit_function)
+    fitness = evaluator.evaluate(pop)
+    for generation in range(generations):
+        if stop_function(fitness):
+            break
+        pop = gn.next_generation(pop, fitness, bits)
+        fitness = evaluator.evaluate(pop)
+    return pop, fitness
+
+# (source, target) pairs of islands exchanging migrants
+def migration_routes(nr_of_islands, topology, rng):
+    islands = range(nr_of_islands)
+    if topology == "ring":
+        return [(i, (i + 1) % nr_of_islands) for i in islands]
+    if topology == "full":
+        return [(i, j) for i in islands for j in islands if i != j]
+    if topology == "random":
+        return [(i, int(i + rng.integers(1, nr_of_islands)) % nr_of_islands) for i in islands]
+    raise ValueError(f"Unknown migration topology: {topology}")
+
+# Send migrants best chromosomes of every island along the topology, replacing the worst chromosomes of the receivers.
+# Migrants are chosen before any island is changed, so all islands migrate at the same time.
+def migrate(populations, fitnesses, migrants, topology, rng):
+    if len(populations) < 2 or migrants <= 0:
+        return
+    best = [np.argsort(fitness)[-migrants:] for fitness in fitnesses]
+    outgoing = [(pop[idx].copy(), fitness[idx].copy()) for pop, fitness, idx in zip(populations, fitnesses, best)]
+
+    incoming = [list() for pop in populations]
+    for source, target in migration_routes(len(populations), topology, rng):
+        incoming[target].append(outgoing[source])
+
+    for target, arrivals in enumerate(incoming):
+        if not arrivals:
+            continue
+        new_pop = np.concatenate([pop for pop, fitness in arrivals])
+        new_fitness = np.concatenate([fitness for pop, fitness in arrivals])
+        count = min(len(new_pop), len(populations[target]))
+        worst = np.argsort(fitnesses[target])[:count]
+        populations[target][worst] = new_pop[:count]
+        fitnesses[target][worst] = new_fitness[:count]
+
+def run_islands(nr_of_islands=nr_of_islands, island_size=island_size, bits=gn.genome_bits,
+                migration_interval=migration_interval, migrants=migrants, topology=topology, max_epochs=max_epochs,
+                fit_function=gn.fit_function, stop_function=gn.stop_function, populations=None, seed=None):
+    # The best chromosome is taken from the evolved islands, so at least one epoch has to run
+    if max_epochs < 1:
+        raise ValueError(f"max_epochs must be at least 1, got {max_epochs}")
+    seeds = np.random.SeedSequence(seed)
+    rng = np.random.default_rng(seeds.spawn(1)[0])
+    gn.rng = rng
+    if populations is None:
+        populations = [gn.random_population(island_size, bits) for island in range(nr_of_islands)]
+    nr_of_islands = len(populations)
+    fitnesses = [None] * nr_of_islands
+    settings = (gn.mutation_probability, gn.selection_method, gn.tournament_size, gn.max_value)
+
+    with ProcessPoolExecutor(max_workers=nr_of_islands) as executor:
+        for epoch in range(max_epochs):
+            tasks = [executor.submit(evolve_island, pop, task_seed, migration_interval, bits, fit_function,
+                                     stop_function, settings)
+                     for pop, task_seed in zip(populations, seeds.spawn(nr_of_islands))]
+            for island, task in enumerate(tasks):
+                populations[island], fitnesses[island] = task.result()
+
+            best = [float(fitness.max()) for fitness in fitnesses]
+            print(f"EPOCH {epoch + 1}: best fitness per island {best}")
+            if any(stop_function(fitness) for fitness in fitnesses):
+                break
+            migrate(populations, fitnesses, migrants, topology, rng)
+
+    island = int(np.argmax([fitness.max() for fitness in fitnesses]))
+    chromosome = populations[island][np.argmax(fitnesses[island])]
+    return chromosome, float(fitnesses[island].max()), epoch + 1
+
+if __name__ == "__main__":
+    # Like in genetic_simple.py, islands start from small fenotypes [0 - 32]
+    rng = np.random.default_rng()
+    initial_populations = [gn.population_from_values(rng.integers(0, 32, size=8)) for island in range(4)]
+    chromosome, fitness, epochs = run_islands(populations=initial_populations, migration_interval=1)
+    print(f"Solution {gn.decode(chromosome[None, :])[0]} with fitness {fitness} found in {epochs} epochs.")
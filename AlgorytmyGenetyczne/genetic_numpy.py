@@ -0,0 +1,165 @@
+#!/usr/bin/python3
+
+# Genetic algorithm on NumPy arrays
+# The same algorithm as in genetic_simple.py, but the whole population is processed at once instead of one chromosome
+# at a time, so populations of 10^5 - 10^6 chromosomes and long genomes can be used.
+#
+# Population is a packed bit matrix - an (N x W) array of uint64 words, where N is the population size and
+# W = ceil(genome_bits / 64). Bit b of a chromosome is bit (b % 64) of word (b // 64).
+# Every step of the algorithm is a batched array operation on the whole generation:
+# - selection - choice of N parents with one of the methods from selection.py (roulette by default),
+# - pairing - random permutation of the parents, split into pairs,
+# - crossover - single point crossover of every pair, with a different point for each pair,
+# - mutation - every bit flipped with mutation_probability.
+#
+# Example - the same problem as in genetic_simple.py: find the maximum of f(x) = 2x + 1 for x in [0 - 127].
+
+import numpy as np
+
+import selection
+from fitness import FitnessEvaluator
+
+genome_bits = 7
+max_value = 128
+population_size = 8
+mutation_probability = 0.05
+selection_method = "roulette"   # "roulette", "alias", "sus" or "tournament", see selection.py
+tournament_size = 2
+
+rng = np.random.default_rng()
+
+def nr_of_words(bits):
+    return (bits + 63) // 64
+
+# Random population of population_size chromosomes with bits random bits each
+def random_population(population_size, bits=genome_bits):
+    words = rng.integers(0, np.iinfo(np.uint64).max, size=(population_size, nr_of_words(bits)), dtype=np.uint64,
+                         endpoint=True)
+    return words & word_masks(bits)
+
+# Population from a list of integer fenotypes (only for genomes up to 64 bits)
+def population_from_values(values, bits=genome_bits):
+    return np.asarray(values, dtype=np.uint64).reshape(-1, 1) & word_masks(bits)
+
+# Integer fenotypes of all chromosomes (only for genomes up to 64 bits)
+def decode(pop):
+    return pop[:, 0]
+
+# Masks of bits used in every word of a genome with bits bits
+def word_masks(bits):
+    masks = np.full(nr_of_words(bits), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if bits % 64:
+        masks[-1] = np.uint64((1 << (bits % 64)) - 1)
+    return masks
+
+# Masks of bits lower than cut for every row - cut is a bit index per row
+def low_bits_masks(cut, nr_of_words):
+    word_start = 64 * np.arange(nr_of_words, dtype=np.int64)
+    bits_in_word = np.clip(cut[:, None] - word_start[None, :], 0, 64).astype(np.uint64)
+    full_word = bits_in_word == 64
+    masks = (np.uint64(1) << np.where(full_word, np.uint64(0), bits_in_word)) - np.uint64(1)
+    return np.where(full_word, np.iinfo(np.uint64).max, masks).astype(np.uint64)
+
+def fit_function(pop):
+    return 2 * decode(pop).astype(np.float64) + 1
+
+def stop_function(fitness):
+    return bool((max_value - fitness <= 1).any())
+
+# Select len(pop) chromosomes with selection_method
+def roulette_check(pop, fitness):
+    if selection_method == "tournament":
+        return pop[selection.tournament_selection(fitness, len(pop), rng, tournament_size)]
+    return pop[selection.select(fitness, len(pop), rng, selection_method)]
+
+# Single point crossover of pairs (parents_1[i], parents_2[i]) - every pair gets its own crossover point
+def cross_function(parents_1, parents_2, bits=genome_bits):
+    cut = rng.integers(0, bits, size=len(parents_1), endpoint=True)
+    low = low_bits_masks(cut, parents_1.shape[1])
+    children_1 = (parents_1 & low) | (parents_2 & ~low)
+    children_2 = (parents_2 & low) | (parents_1 & ~low)
+    return children_1, children_2
+
+# Indices of the flipped bits when each of nr_of_bits bits is flipped with probability p. Distances between consecutive
+# flips are geometric, so only the flipped bits are drawn - the cost depends on the number of mutations, not on the
+# size of the population.
+def flipped_bits(nr_of_bits, p):
+    if p <= 0 or nr_of_bits == 0:
+        return np.empty(0, dtype=np.int64)
+    if p >= 1:
+        return np.arange(nr_of_bits, dtype=np.int64)
+    expected = nr_of_bits * p
+    chunk = int(expected + 4 * np.sqrt(expected)) + 16
+    positions = list()
+    last = -1
+    while last < nr_of_bits:
+        chunk_positions = last + np.cumsum(rng.geometric(p, size=chunk))
+        positions.append(chunk_positions)
+        last = chunk_positions[-1]
+    flips = np.concatenate(positions)
+    return flips[flips < nr_of_bits]
+
+# Random words in which every bit is 1 with probability p (rounded to precision bits). Built from the binary expansion
+# of p, starting from its lowest bit: a 1 bit ORs the mask with a uniform random word, a 0 bit ANDs it. The cost is
+# precision random words per word of the population, whatever p is.
+def bernoulli_masks(shape, p, precision=16):
+    level = int(round(p * (1 << precision)))
+    masks = np.zeros(shape, dtype=np.uint64)
+    if level >= 1 << precision:
+        return ~masks
+    while level and not level & 1:
+        level >>= 1
+        precision -= 1
+    for i in range(precision):
+        random_words = rng.integers(0, np.iinfo(np.uint64).max, size=shape, dtype=np.uint64, endpoint=True)
+        if (level >> i) & 1:
+            masks |= random_words
+        else:
+            masks &= random_words
+    return masks
+
+# Flip every bit with mutation_probability. With at least one flip per word on average, whole masks of flipped bits
+# are drawn (bernoulli_masks); with fewer flips, only the positions of the flipped bits (flipped_bits).
+def mutation_function(pop, bits=genome_bits):
+    if mutation_probability * 64 >= 1:
+        pop ^= bernoulli_masks(pop.shape, mutation_probability) & word_masks(bits)
+        return pop
+    flips = flipped_bits(pop.shape[0] * bits, mutation_probability)
+    if len(flips) == 0:
+        return pop
+    rows, bit = np.divmod(flips, bits)
+    # Flips are sorted, so flips in the same word are neighbours - join them into one mask per word
+    words = rows * pop.shape[1] + bit // 64
+    starts = np.flatnonzero(np.diff(words, prepend=-1))
+    masks = np.bitwise_or.reduceat(np.uint64(1) << (bit % 64).astype(np.uint64), starts)
+    pop.reshape(-1)[words[starts]] ^= masks
+    return pop
+
+# Pair chromosomes at random, cross every pair and mutate the children. With an odd population the last chromosome
+# is crossed with the first one, and only one of their children is kept.
+def pair_function(pop, bits=genome_bits):
+    pop = pop[rng.permutation(len(pop))]
+    nr_of_pairs = (len(pop) + 1) // 2
+    parents_1 = pop[:nr_of_pairs]
+    parents_2 = np.roll(pop, -nr_of_pairs, axis=0)[:nr_of_pairs]
+    children_1, children_2 = cross_function(parents_1, parents_2, bits)
+    children = np.concatenate([children_1, children_2])[:len(pop)]
+    return mutation_function(children, bits)
+
+def next_generation(pop, fitness, bits=genome_bits):
+    return pair_function(roulette_check(pop, fitness), bits)
+
+if __name__ == "__main__":
+    population = population_from_values([6, 5, 13, 21, 26, 18, 8, 5])
+    iteration = 0
+    evaluator = FitnessEvaluator(fit_function)
+    fitness = evaluator.evaluate(population)
+
+    while(not stop_function(fitness)):
+        population = next_generation(population, fitness)
+        fitness = evaluator.evaluate(population)
+        iteration += 1
+        print(f"ITERATION {iteration}: best fenotype {decode(population)[np.argmax(fitness)]}, mean fitness {fitness.mean():.2f}")
+
+    print("Solution found in " + str(iteration) + " iterations.")
+    print(f"Fit function evaluated {evaluator.evaluations} chromosomes, {evaluator.hits} taken from cache.")
@@ -27,13 +27,18 @@
 #
 # 2. Define selection method. In our case we will use rulette round selection method. For each chromoson ch we apply the formula: v(ch) = f(ch) / (sum(f(ch1) .. f(chN))). 
 #      The formula will give higher value is fit function will give a higher output for a given chromoson. It means - probability of choose chromosons given higher fit function value will be higher.
-#      Now we define an 100 element array. In the array we have a value of chromosons. Each chromoson is in the arras as often, as selection method output is. Next, we use the arras as an input for random function to selct
-#      The chromosons for next iterations.
+#      Now we build cumulative sums of fit values of all chromosons. Each chromoson owns a part of [0 - sum] range, as long as its fit value. For each pick we draw a random
+#      number from that range and find its owner with binary search. The probability of choosing a chromoson is exactly v(ch), even for small fit values.
 
 import random
+from functools import lru_cache
+from bisect import bisect_right
+from itertools import accumulate
 
 max_value = 128
 
+# Fit values are cached - the same chromosons are checked many times (stop function, roulette, next iterations)
+@lru_cache(maxsize=1024)
 def fit_function(x):
     return 2 * x + 1
 
@@ -46,26 +51,15 @@ def stop_function(pop):
 
 # Implementation of roulette check for selectong chromosons form population.
 def roulette_check(pop):
-    # Generate fit values for all chromosons from initial pop
-    all_values = 0
-    fit_values = dict()
-    pop_size = len(pop)
-
-    for ch in pop:
-        all_values += fit_function(ch)
-
-    for i in range(pop_size):
-        fit_values[pop[i]] = int(round(100 * fit_function(pop[i]) / all_values, 0))
-
-    # Generate roulette list
-    roulette_list = list()
-    for key, val in fit_values.items():
-        roulette_list.extend([key] * val)
+    # Cumulative fit values of all chromosons from initial pop
+    cumulative = list(accumulate(fit_function(ch) for ch in pop))
+    all_values = cumulative[-1]
 
     # Choose a N items
     choosen_items = list()
-    for i in range(pop_size):
-        choosen_items.extend([random.choice(roulette_list)])
+    for i in range(len(pop)):
+        idx = bisect_right(cumulative, random.random() * all_values)
+        choosen_items.append(pop[min(idx, len(pop) - 1)])
 
     return choosen_items
 
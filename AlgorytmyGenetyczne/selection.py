@@ -0,0 +1,91 @@
+#!/usr/bin/python3
+
+# Selection methods for genetic algorithms
+# Every method takes an array of fitness values (higher is better) and returns indices of n selected chromosomes.
+# The probabilities are exact - no chromosome is rounded down to zero probability, as with a fixed size roulette list.
+#
+# - roulette - fitness proportional selection. Cumulative sums of fitness are built once (O(N)), and every pick is
+#   a binary search of a random point in them (O(log N)).
+# - alias - fitness proportional selection with Vose's alias method. Building the table costs O(N), but every pick is
+#   O(1), so it pays off when many picks are done from the same fitness values.
+# - sus - stochastic universal sampling. Fitness proportional, but n equally spaced pointers are used instead of
+#   n independent random points, so the number of copies of every chromosome is as close as possible to its expected value.
+# - tournament - the best of tournament_size random chromosomes wins. Uses only the order of fitness values,
+#   so it works with negative fitness and does not depend on fitness scaling.
+
+import numpy as np
+
+def check_fitness(fitness):
+    fitness = np.asarray(fitness, dtype=np.float64)
+    if (fitness < 0).any():
+        raise ValueError("Fitness proportional selection needs non-negative fitness values")
+    return fitness
+
+# Cumulative sums of fitness. When all fitness values are 0, every chromosome gets the same probability.
+def cumulative_fitness(fitness):
+    fitness = check_fitness(fitness)
+    cumulative = np.cumsum(fitness)
+    if cumulative[-1] <= 0:
+        cumulative = np.arange(1, len(fitness) + 1, dtype=np.float64)
+    return cumulative
+
+# Random points are sorted before the binary search - searches for sorted points walk the cumulative sums in order,
+# which is several times faster for big populations than jumping over them at random. Picks are shuffled afterwards.
+def roulette_selection(fitness, n, rng):
+    cumulative = cumulative_fitness(fitness)
+    picked = np.searchsorted(cumulative, np.sort(rng.random(n)) * cumulative[-1], side="right")
+    return rng.permutation(np.minimum(picked, len(cumulative) - 1))
+
+# Vose's alias table - (probability, alias) arrays. Every column i is chosen with the same probability, and then
+# chromosome i is selected with probability[i], or alias[i] otherwise.
+def alias_table(fitness):
+    fitness = check_fitness(fitness)
+    n = len(fitness)
+    total = fitness.sum()
+    probability = fitness * n / total if total > 0 else np.ones(n)
+    alias = np.arange(n)
+
+    small = list(np.flatnonzero(probability < 1))
+    large = list(np.flatnonzero(probability >= 1))
+    while small and large:
+        s, l = small.pop(), large.pop()
+        alias[s] = l
+        probability[l] -= 1 - probability[s]
+        if probability[l] < 1:
+            small.append(l)
+        else:
+            large.append(l)
+    # Leftovers differ from 1 only by rounding errors
+    probability[small + large] = 1
+    return probability, alias
+
+def alias_selection(fitness, n, rng, table=None):
+    probability, alias = alias_table(fitness) if table is None else table
+    columns = rng.integers(0, len(probability), size=n)
+    return np.where(rng.random(n) < probability[columns], columns, alias[columns])
+
+def sus_selection(fitness, n, rng):
+    cumulative = cumulative_fitness(fitness)
+    step = cumulative[-1] / n
+    pointers = (rng.random() + np.arange(n)) * step
+    picked = np.minimum(np.searchsorted(cumulative, pointers, side="right"), len(cumulative) - 1)
+    # Pointers are sorted, so are the picks - shuffle them before they are paired
+    return rng.permutation(picked)
+
+def tournament_selection(fitness, n, rng, tournament_size=2):
+    fitness = np.asarray(fitness)
+    contestants = rng.integers(0, len(fitness), size=(n, tournament_size))
+    winners = np.argmax(fitness[contestants], axis=1)
+    return contestants[np.arange(n), winners]
+
+selection_methods = {
+    "roulette": roulette_selection,
+    "alias": alias_selection,
+    "sus": sus_selection,
+    "tournament": tournament_selection,
+}
+
+def select(fitness, n, rng, method="roulette", **kwargs):
+    if method not in selection_methods:
+        raise ValueError(f"Unknown selection method: {method}")
+    return selection_methods[method](fitness, n, rng, **kwargs)
@@ -0,0 +1,113 @@
+import os
+import queue
+import random
+import re
+import threading
+
+import torch
+
+# Kopia stanu (state_dict modelu / optymalizatora) na CPU. Trening dalej modyfikuje tensory w miejscu,
+# więc do wątku zapisującego musi trafić niezależna kopia
+def snapshot(state):
+    if isinstance(state, torch.Tensor):
+        return state.detach().to('cpu', copy=True)
+    if isinstance(state, dict):
+        return {key: snapshot(value) for key, value in state.items()}
+    if isinstance(state, (list, tuple)):
+        return type(state)(snapshot(value) for value in state)
+    return state
+
+def rng_state() -> dict:
+    state = dict(torch=torch.get_rng_state(), python=random.getstate())
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state: dict) -> None:
+    torch.set_rng_state(state['torch'])
+    random.setstate(state['python'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
+
+class CheckpointManager():
+
+    """
+    CheckpointManager zapisuje punkty kontrolne treningu: stan modelu i optymalizatora, numer ukończonej epoki,
+    stan generatorów liczb losowych i ziarno danych treningowych. save tylko kopiuje stan do pamięci, zapis na dysk
+    odbywa się w osobnym wątku, więc pętla treningowa nie czeka na dysk. Plik jest zapisywany atomowo - najpierw
+    do pliku tymczasowego, a potem podmieniany przez os.replace - więc przerwany zapis nie psuje poprzednich
+    punktów kontrolnych. W katalogu zostaje keep_last najnowszych plików checkpoint_<epoka>.pt.
+    """
+
+    file_pattern = re.compile(r'^checkpoint_(\d+)\.pt$')
+
+    def __init__(self, checkpoint_dir='checkpoints/', every_epochs: int=10, keep_last: int=3) -> None:
+        self.checkpoint_dir = checkpoint_dir
+        self.every_epochs = every_epochs
+        self.keep_last = keep_last
+        os.makedirs(checkpoint_dir, exist_ok=True)
+
+        self.queue = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name='CheckpointManager', daemon=True)
+        self.thread.start()
+
+    def path(self, epoch: int) -> str:
+        return os.path.join(self.checkpoint_dir, f'checkpoint_{epoch:06d}.pt')
+
+    # Czy po ukończeniu epoki epoch (liczonej od 1) należy zapisać punkt kontrolny
+    def due(self, epoch: int, epochs_num: int) -> bool:
+        return epoch % self.every_epochs == 0 or epoch == epochs_num
+
+    def save(self, epoch: int, model, optimizer, data_seed=None) -> None:
+        checkpoint = dict(epoch=epoch, model=snapshot(model.state_dict()), optimizer=snapshot(optimizer.state_dict()),
+                          rng=rng_state(), data_seed=data_seed)
+        self.queue.put(checkpoint)
+
+    def run(self) -> None:
+        while True:
+            checkpoint = self.queue.get()
+            if checkpoint is None:
+                self.queue.task_done()
+                break
+            try:
+                self.write(checkpoint)
+            except OSError as e:
+                print(f"Nie udało się zapisać punktu kontrolnego epoki {checkpoint['epoch']}: {e}")
+            finally:
+                self.queue.task_done()
+
+    def write(self, checkpoint: dict) -> None:
+        path = self.path(checkpoint['epoch'])
+        temporary_path = path + '.tmp'
+        with open(temporary_path, 'wb') as f:
+            torch.save(checkpoint, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_path, path)
+        for old_path in self.checkpoints()[self.keep_last:]:
+            os.remove(old_path)
+
+    # Ścieżki punktów kontrolnych od najnowszego
+    def checkpoints(self) -> list:
+        epochs = [int(match.group(1)) for match in map(self.file_pattern.match, os.listdir(self.checkpoint_dir)) if match]
+        return [self.path(epoch) for epoch in sorted(epochs, reverse=True)]
+
+    # Najnowszy punkt kontrolny, który daje się wczytać (uszkodzone pliki są pomijane), lub None
+    def load_latest(self, map_location='cpu'):
+        for path in self.checkpoints():
+            try:
+                checkpoint = torch.load(path, map_location=map_location, weights_only=True)
+            except Exception as e:
+                print(f"Pominięto uszkodzony punkt kontrolny {path}: {e}")
+                continue
+            print("Training resumed from ", path)
+            return checkpoint
+        return None
+
+    # Czekanie na zapis wszystkich zleconych punktów kontrolnych
+    def wait(self) -> None:
+        self.queue.join()
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
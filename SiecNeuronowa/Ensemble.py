@@ -0,0 +1,151 @@
+import argparse
+import copy
+import time
+import torch
+import torch.nn as nn
+from torch.func import functional_call, stack_module_state, vmap
+from SimpleNeuronChain import ClassifierModel, XORDataCreator
+
+class EnsembleTrainer():
+
+    """
+    EnsembleTrainer trenuje jednocześnie N niezależnych kopii ClassifierModel. Parametry wszystkich kopii są złożone
+    w tensory z dodatkowym pierwszym wymiarem (stack_module_state), forward wszystkich kopii jest liczony jednym
+    wywołaniem przez torch.func.vmap, a gradienty jednym przejściem autograd. Mały model XOR nie wykorzystuje procesora
+    przy pojedynczym treningu - tu każda operacja dotyczy N modeli naraz, więc narzut na wywołanie operacji
+    rozkłada się na wszystkie kopie. Każda kopia ma własne ziarno (wagi początkowe i dane treningowe) oraz własny
+    współczynnik uczenia. predict zwraca średnią prawdopodobieństw wszystkich kopii (uśrednianie zespołu).
+    """
+
+    def __init__(self, replicas: int, hidden_layer_neurons_number: int=5, seeds=None, lr=0.1, data_size: int=250,
+                 noise_std_deviation: float=0.1, device='cpu') -> None:
+        self.replicas = replicas
+        self.hidden_layer_neurons_number = hidden_layer_neurons_number
+        self.seeds = list(seeds) if seeds is not None else list(range(replicas))
+        self.device = torch.device(device)
+
+        models = list()
+        for seed in self.seeds:
+            torch.manual_seed(seed)
+            models.append(ClassifierModel(inputs_number=2, hidden_layer_neurons_number=hidden_layer_neurons_number,
+                                          outputs_number=1))
+        params, buffers = stack_module_state(models)
+        self.params = {name: value.detach().to(self.device) for name, value in params.items()}
+        self.buffers = {name: value.to(self.device) for name, value in buffers.items()}
+        # Model bez danych ('meta') służy tylko jako opis obliczeń dla functional_call
+        self.base_model = copy.deepcopy(models[0]).to('meta')
+
+        # Współczynnik uczenia - jeden dla wszystkich kopii lub osobny dla każdej
+        self.lr = torch.as_tensor(lr, dtype=torch.float32, device=self.device).expand(replicas).clone()
+
+        # Dane treningowe każdej kopii: wejścia (N x data_size x 2) i etykiety (N x data_size)
+        data_sets = [XORDataCreator(data_size, noise_std_deviation, seed=seed) for seed in self.seeds]
+        self.data_inputs = torch.stack([data_set.data_inputs for data_set in data_sets]).to(self.device)
+        self.data_labels = torch.stack([data_set.data_labels for data_set in data_sets]).float().to(self.device)
+
+        # Błąd liczony osobno dla każdej próbki, średnia po próbkach jest osobna dla każdej kopii
+        self.loss_calculation_model = nn.BCEWithLogitsLoss(reduction='none')
+        self.forward_function = vmap(self.replica_forward)
+        self.predict_function = vmap(self.replica_forward, in_dims=(0, 0, None))
+
+    def replica_forward(self, params, buffers, inputs):
+        return functional_call(self.base_model, (params, buffers), (inputs,)).squeeze(dim=-1)
+
+    # Gradienty wszystkich kopii naraz: forward przez vmap, a wsteczna propagacja zwykłym autograd od sumy błędów
+    # kopii - kopie są niezależne, więc gradient sumy względem parametrów kopii to gradient jej własnego błędu.
+    # Jedno przejście autograd jest kilka razy tańsze niż vmap(grad(...)), który przekształca funkcję przy każdym
+    # wywołaniu. Zwraca gradienty w kolejności self.params i średni błąd każdej kopii
+    def step_function(self, inputs, labels):
+        params = {name: value.detach().requires_grad_() for name, value in self.params.items()}
+        loss = self.loss_calculation_model(self.forward_function(params, self.buffers, inputs), labels).mean(dim=1)
+        grads = torch.autograd.grad(loss.sum(), list(params.values()))
+        return grads, loss.detach()
+
+    # Trening wszystkich kopii, zwraca średni błąd każdej kopii w każdej epoce (epochs_num x N)
+    def train(self, epochs_num: int=150, batch_size: int=32) -> torch.Tensor:
+        replicas, data_size = self.data_labels.shape
+        params = list(self.params.values())
+        # Ujemne współczynniki uczenia w kształcie pasującym do każdego parametru - krok SGD wszystkich kopii
+        # to jedno wywołanie torch._foreach_addcmul_ (param += grad * -lr)
+        negative_lr = [-self.lr.view(-1, *[1] * (param.dim() - 1)) for param in params]
+        batch_starts = range(0, data_size, batch_size)
+        batch_sizes = torch.tensor([min(batch_size, data_size - start) for start in batch_starts],
+                                   dtype=torch.float32, device=self.device)
+        losses = torch.zeros((epochs_num, replicas), device=self.device)
+        for current_epoch in range(epochs_num):
+            # Osobna losowa kolejność próbek dla każdej kopii - dane całej epoki przestawiamy jedną operacją,
+            # paczki są już tylko widokami tych tensorów
+            order = torch.argsort(torch.rand(replicas, data_size, device=self.device), dim=1)
+            epoch_inputs = torch.gather(self.data_inputs, 1, order.unsqueeze(-1).expand(-1, -1, 2))
+            epoch_labels = torch.gather(self.data_labels, 1, order)
+            batch_losses = list()
+            for start in batch_starts:
+                grads, loss = self.step_function(epoch_inputs[:, start:start + batch_size],
+                                                 epoch_labels[:, start:start + batch_size])
+                torch._foreach_addcmul_(params, grads, negative_lr)
+                batch_losses.append(loss)
+            losses[current_epoch] = torch.stack(batch_losses, dim=1) @ batch_sizes
+        return losses / data_size
+
+    # Prawdopodobieństwa każdej kopii dla tych samych danych (N x liczba próbek)
+    @torch.inference_mode()
+    def predict_replicas(self, inputs) -> torch.Tensor:
+        inputs = torch.as_tensor(inputs, dtype=torch.float32, device=self.device)
+        return torch.sigmoid(self.predict_function(self.params, self.buffers, inputs))
+
+    # Uśrednianie zespołu - średnie prawdopodobieństwo wszystkich kopii
+    def predict(self, inputs) -> torch.Tensor:
+        return self.predict_replicas(inputs).mean(dim=0)
+
+    # Zwykły ClassifierModel z wagami jednej kopii (np. do zapisu lub inference.py)
+    def replica_model(self, replica: int) -> ClassifierModel:
+        model = ClassifierModel(inputs_number=2, hidden_layer_neurons_number=self.hidden_layer_neurons_number,
+                                outputs_number=1)
+        model.load_state_dict({name: value[replica].cpu() for name, value in {**self.params, **self.buffers}.items()})
+        return model.eval()
+
+# Dla porównania - trening tych samych kopii jedna po drugiej
+def train_sequential(trainer: EnsembleTrainer, epochs_num: int, batch_size: int) -> None:
+    loss_calculation_model = nn.BCEWithLogitsLoss()
+    for replica in range(trainer.replicas):
+        model = trainer.replica_model(replica).train()
+        optimizer = torch.optim.SGD(model.parameters(), lr=trainer.lr[replica].item())
+        inputs, labels = trainer.data_inputs[replica].cpu(), trainer.data_labels[replica].cpu()
+        for current_epoch in range(epochs_num):
+            order = torch.randperm(len(labels))
+            for start in range(0, len(labels), batch_size):
+                indices = order[start:start + batch_size]
+                loss = loss_calculation_model(model(inputs[indices]).squeeze(dim=1), labels[indices])
+                optimizer.zero_grad(set_to_none=True)
+                loss.backward()
+                optimizer.step()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trening zespołu klasyfikatorów XOR przez torch.func.vmap")
+    parser.add_argument("--replicas", type=int, default=256)
+    parser.add_argument("--epochs", type=int, default=150)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--lr", type=float, nargs="+", default=[0.1],
+                        help="jeden współczynnik uczenia lub po jednym dla każdej kopii")
+    parser.add_argument("--compare", action="store_true", help="porównaj z treningiem kopii jedna po drugiej")
+    args = parser.parse_args()
+
+    lr = args.lr[0] if len(args.lr) == 1 else args.lr
+    trainer = EnsembleTrainer(args.replicas, lr=lr)
+    start = time.perf_counter()
+    losses = trainer.train(args.epochs, args.batch_size)
+    elapsed = time.perf_counter() - start
+    print(f"{args.replicas} kopii w {elapsed:.2f} s ({elapsed / args.replicas * 1000:.1f} ms na model), "
+          f"błąd ostatniej epoki: min {losses[-1].min().item():.4f}, średnio {losses[-1].mean().item():.4f}")
+
+    validation = XORDataCreator(2000, 0.1, seed=1000003)
+    replica_accuracy = ((trainer.predict_replicas(validation.data_inputs) > 0.5) == validation.data_labels.bool()).float().mean(dim=1)
+    ensemble_accuracy = ((trainer.predict(validation.data_inputs) > 0.5) == validation.data_labels.bool()).float().mean()
+    print(f"Poprawność kopii: średnio {replica_accuracy.mean().item():.3f}, zespołu: {ensemble_accuracy.item():.3f}")
+
+    if args.compare:
+        start = time.perf_counter()
+        train_sequential(EnsembleTrainer(args.replicas, lr=lr), args.epochs, args.batch_size)
+        sequential = time.perf_counter() - start
+        print(f"Trening kopii jedna po drugiej: {sequential:.2f} s ({sequential / args.replicas * 1000:.1f} ms na model), "
+              f"przyspieszenie x{sequential / elapsed:.1f}")
@@ -0,0 +1,107 @@
+import numpy as np
+import torch
+import torch.utils.data as data
+from SimpleNeuronChain import generate_xor_chunks
+
+# One sample on disk - fixed-width record of two float32 inputs and an int64 label (16 bytes)
+sample_dtype = np.dtype([('inputs', '<f4', (2,)), ('label', '<i8')])
+
+# Write data_size random XOR samples to a .npy file with sample_dtype records. Samples are generated and written
+# chunk by chunk into the memory-mapped file, so the whole data set never has to fit in RAM
+def write_xor_dataset(path, data_size, noise_std_deviation, seed=None, chunk_size=1000000) -> None:
+    records = np.lib.format.open_memmap(path, mode='w+', dtype=sample_dtype, shape=(data_size,))
+    for start, stop, inputs, labels in generate_xor_chunks(data_size, noise_std_deviation, seed, chunk_size):
+        records['inputs'][start:stop] = inputs.numpy()
+        records['label'][start:stop] = labels.numpy()
+    records.flush()
+    del records
+
+# Open a sample file without reading it - copy-on-write mode gives writable views (required by torch.from_numpy),
+# while the file itself is never modified
+def open_xor_dataset(path) -> np.memmap:
+    records = np.load(path, mmap_mode='c')
+    if records.dtype != sample_dtype:
+        raise ValueError(f"{path} nie zawiera próbek w formacie {sample_dtype}")
+    return records
+
+# [inputs, labels] tensors sharing memory with a slice (or a gathered copy) of sample records
+def records_to_batch(records):
+    return [torch.from_numpy(records['inputs']), torch.from_numpy(records['label'])]
+
+class MemoryMappedXORDataset(data.Dataset):
+
+    """
+    MemoryMappedXORDataset udostępnia próbki XOR zapisane przez write_xor_dataset bez wczytywania całego pliku
+    do pamięci. System operacyjny doczytuje tylko te strony pliku, z których pochodzą próbki paczki, a tensory
+    są tworzone przez torch.from_numpy bez dodatkowego kopiowania. Plik jest otwierany leniwie w każdym procesie
+    (również w procesach DataLoader), więc przy num_workers > 0 do procesów trafia tylko ścieżka pliku.
+    """
+
+    def __init__(self, path) -> None:
+        super().__init__()
+        self.path = path
+        self.records = None
+        self.data_size = len(open_xor_dataset(path))
+
+    def get_records(self):
+        if self.records is None:
+            self.records = open_xor_dataset(self.path)
+        return self.records
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['records'] = None
+        return state
+
+    def __len__(self):
+        return self.data_size
+
+    def __getitem__(self, idx):
+        record = self.get_records()[idx]
+        return [torch.from_numpy(record['inputs'].copy()), torch.tensor(record['label'])]
+
+    # Batch access used by DataLoader with collate_batch - sorted indices make the reads from the file sequential
+    def __getitems__(self, indices):
+        indices = np.asarray(indices)
+        order = np.argsort(indices, kind='stable')
+        batch = np.empty(len(indices), dtype=sample_dtype)
+        batch[order] = self.get_records()[indices[order]]
+        return records_to_batch(batch)
+
+class StreamingXORDataset(data.IterableDataset):
+
+    """
+    StreamingXORDataset czyta próbki XOR z pliku write_xor_dataset sekwencyjnie, blokami po batch_size próbek.
+    Każdy blok jest gotową paczką [wejścia, etykiety], której tensory wskazują bezpośrednio na zmapowany plik
+    (zero kopiowania), dlatego DataLoader musi mieć batch_size=None. Przy num_workers > 0 bloki są dzielone
+    między procesy (proces k czyta bloki k, k + num_workers, ...), więc każda próbka trafia do treningu raz na epokę.
+    Przy shuffle kolejność bloków jest losowana co epokę z ziarna seed, tak samo we wszystkich procesach.
+    """
+
+    def __init__(self, path, batch_size: int=32, shuffle: bool=False, seed: int=0) -> None:
+        super().__init__()
+        self.path = path
+        self.batch_size = batch_size
+        self.shuffle = shuffle
+        self.seed = seed
+        self.epoch = 0
+        self.data_size = len(open_xor_dataset(path))
+
+    def __len__(self):
+        return self.data_size
+
+    def __iter__(self):
+        records = open_xor_dataset(self.path)
+        blocks = torch.arange(0, self.data_size, self.batch_size)
+        if self.shuffle:
+            generator = torch.Generator().manual_seed(self.seed + self.epoch)
+            blocks = blocks[torch.randperm(len(blocks), generator=generator)]
+        self.epoch += 1
+
+        # Per-worker sharding of blocks
+        worker_info = data.get_worker_info()
+        if worker_info is not None:
+            blocks = blocks[worker_info.id::worker_info.num_workers]
+
+        for start in blocks.tolist():
+            yield records_to_batch(records[start:start + self.batch_size])
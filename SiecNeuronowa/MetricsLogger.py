@@ -0,0 +1,100 @@
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+import torch
+from torch.utils.tensorboard import SummaryWriter
+
+class AsyncMetricsLogger():
+
+    """
+    AsyncMetricsLogger zbiera metryki treningu w pamięci i zapisuje je do TensorBoard w osobnym wątku.
+    Wartości dodane przez add_scalar są uśredniane i zapisywane najwyżej raz na flush_every_steps kroków
+    lub flush_every_seconds sekund, więc pętla treningowa nie czeka na zapis na dysk, a plik zdarzeń nie rośnie
+    z każdą próbką. Wartości mogą być tensorami na GPU - zamiana na liczby (synchronizacja z GPU) odbywa się
+    dopiero w wątku zapisującym. Dodatkowo logowane są czasy faz treningu (phase) i przepustowość (count_samples).
+    """
+
+    def __init__(self, log_dir='logs/', flush_every_steps: int=10, flush_every_seconds: float=5.0) -> None:
+        self.writer = SummaryWriter(log_dir)
+        self.flush_every_steps = flush_every_steps
+        self.flush_every_seconds = flush_every_seconds
+
+        self.lock = threading.Lock()
+        self.pending = dict()                   # tag -> [suma wartości, liczba wartości, ostatni krok]
+        self.phase_times = defaultdict(float)   # faza -> czas w sekundach od ostatniego zapisu
+        self.samples = 0
+        self.last_step = 0
+        self.last_flush_step = 0
+        self.last_flush_time = time.perf_counter()
+
+        self.wake = threading.Event()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name='AsyncMetricsLogger', daemon=True)
+        self.thread.start()
+
+    def add_scalar(self, tag, value, global_step) -> None:
+        if isinstance(value, torch.Tensor):
+            value = value.detach()
+        with self.lock:
+            entry = self.pending.get(tag)
+            if entry is None:
+                self.pending[tag] = [value, 1, global_step]
+            else:
+                entry[0] = entry[0] + value
+                entry[1] += 1
+                entry[2] = global_step
+            self.last_step = max(self.last_step, global_step)
+            if self.last_step - self.last_flush_step >= self.flush_every_steps:
+                self.wake.set()
+
+    def add_graph(self, model, inputs) -> None:
+        self.writer.add_graph(model, inputs)
+
+    # Liczba przetworzonych próbek - przepustowość (próbki/s) jest liczona przy każdym zapisie
+    def count_samples(self, samples: int) -> None:
+        with self.lock:
+            self.samples += samples
+
+    # Pomiar czasu fazy treningu (np. dane, forward, backward), sumowany między zapisami
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            with self.lock:
+                self.phase_times[name] += elapsed
+
+    def run(self) -> None:
+        while not self.closed:
+            self.wake.wait(self.flush_every_seconds)
+            self.wake.clear()
+            self.flush()
+
+    def flush(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, dict()
+            phase_times, self.phase_times = self.phase_times, defaultdict(float)
+            samples, self.samples = self.samples, 0
+            step = self.last_step
+            self.last_flush_step = step
+            now = time.perf_counter()
+            elapsed, self.last_flush_time = now - self.last_flush_time, now
+
+        for tag, (total, count, global_step) in pending.items():
+            self.writer.add_scalar(tag, float(total) / count, global_step=global_step)
+        for name, seconds in phase_times.items():
+            self.writer.add_scalar(f'czas/{name}', seconds, global_step=step)
+        if samples and elapsed > 0:
+            self.writer.add_scalar('probki_na_sekunde', samples / elapsed, global_step=step)
+        self.writer.flush()
+
+    def close(self) -> None:
+        self.closed = True
+        self.wake.set()
+        self.thread.join()
+        self.flush()
+        self.writer.close()
@@ -3,6 +3,30 @@ import torch.utils.data as data
 
 # We will try to create a simple one-directional neuron chain for XOR operation on float numbers.
 
+# Random XOR samples generated chunk by chunk - yields (start, stop, inputs, labels) for samples start:stop.
+# The same seed and chunk_size give the same samples, no matter where they are stored
+def generate_xor_chunks(data_size, noise_std_deviation, seed=None, chunk_size=None):
+    generator = torch.Generator()
+    if seed is not None:
+        generator.manual_seed(seed)
+    else:
+        generator.seed()
+
+    chunk_size = chunk_size or data_size
+    for start in range(0, data_size, chunk_size):
+        stop = min(start + chunk_size, data_size)
+
+        # Generate random [x0, x1] pairs of 0 / 1 values
+        xor_data = torch.randint(low=0, high=2, size=(stop - start, 2), generator=generator)
+
+        # Data labeling - assing expected value d to each data pair
+        # Xor of both columns is computed for all pairs at once
+        labels = xor_data[:, 0] ^ xor_data[:, 1]
+
+        # Combined data + noise
+        xor_data_noise = noise_std_deviation * torch.randn((stop - start, 2), generator=generator)
+        yield start, stop, xor_data + xor_data_noise, labels
+
 # Class that would pairs of input - output training data
 class XORDataCreator(data.Dataset):
 
@@ -14,30 +38,25 @@ class XORDataCreator(data.Dataset):
     poprawnością nieznanej dotąd pary liczb zmiennoprzecinkowych.
     """
 
-    def __init__(self, data_size, noise_std_deviation) -> None :
+    def __init__(self, data_size, noise_std_deviation, seed=None, chunk_size=None) -> None :
         super().__init__()
         self.data_size = data_size
         self.noise_std_deviation = noise_std_deviation
+        # Fixed seed gives the same data set on every run (for the same chunk_size)
+        self.seed = seed
+        # Big data sets are generated in chunks of chunk_size samples, so large temporary tensors are not needed
+        self.chunk_size = chunk_size
         self.generate_random_xor_data()
 
     def generate_random_xor_data(self):
-        # Generate random float [x0, x1] pairs of data from  range [0 ... 2]
-        xor_data = torch.randint(low=0, high=2, size=(self.data_size, 2), dtype=torch.float32)
-
-        # Generate random noise for data
-        xor_data_noise = self.noise_std_deviation * torch.randn(xor_data.shape)
-
-        # Data labeling - assing expected value d to each data pair
-        # Here we cast each data from pair to int and generate xor result
-        labels = [xor_item[0].to(int) ^ xor_item[1].to(int) for xor_item in xor_data]
-
-        # Store combined data + noise
-        xor_data_with_noise = xor_data + xor_data_noise
-        self.data_inputs = xor_data_with_noise
+        # Preallocated tensors for all data - inputs as one (data_size x 2) tensor, labels as one contiguous tensor
+        self.data_inputs = torch.empty((self.data_size, 2), dtype=torch.float32)
+        self.data_labels = torch.empty(self.data_size, dtype=torch.long)
 
-        # Convert results to float numbers
-        labels_converted_to_numbers = labels
-        self.data_labels = [label.to(torch.long) for label in labels]
+        for start, stop, inputs, labels in generate_xor_chunks(self.data_size, self.noise_std_deviation, self.seed,
+                                                               self.chunk_size):
+            self.data_inputs[start:stop] = inputs
+            self.data_labels[start:stop] = labels
 
     def __len__(self):
         return self.data_size
@@ -45,11 +64,22 @@ class XORDataCreator(data.Dataset):
     def __getitem__(self, idx):
         return [self.data_inputs[idx], self.data_labels[idx]]
 
-# Use generator to generate 300 training data sets
-xor_training_data = XORDataCreator(300, 0.1)
+    # Batch access used by DataLoader - the whole batch is indexed at once, instead of one sample at a time.
+    # Returns an already collated [inputs, labels] batch, so DataLoader has to use collate_batch.
+    def __getitems__(self, indices):
+        indices = torch.as_tensor(indices)
+        return [self.data_inputs[indices], self.data_labels[indices]]
 
-#Print some data
-print(xor_training_data[121])
+# Collate function for datasets returning whole batches from __getitems__ - the batch is already collated
+def collate_batch(batch):
+    return batch
+
+if __name__ == "__main__":
+    # Use generator to generate 300 training data sets
+    xor_training_data = XORDataCreator(300, 0.1)
+
+    #Print some data
+    print(xor_training_data[121])
 
 
 #Create neuron chain and define its archotecture
@@ -86,73 +116,176 @@ class ClassifierModel(nn.Module):
 
 # Now we create a procedure for training the network
 
+import random
 import torch
 import torch.nn as nn
-from torch.utils.tensorboard import SummaryWriter
+from Checkpointing import CheckpointManager, set_rng_state
+from MetricsLogger import AsyncMetricsLogger
+from TrainingProfiler import TrainingProfiler
  
 class Net():
  
-    def __init__(self) -> None:
+    def __init__(self, data_seed=None, dataset=None) -> None:
         self.loss_calculation_model = None
         self.optimizer = None
-        self.data_loader = XORDataCreator(data_size=250, noise_std_deviation=0.1)
+        # Ziarno danych treningowych trafia do punktów kontrolnych, wznowiony trening korzysta z tych samych danych
+        self.data_seed = data_seed if data_seed is not None else random.randrange(2**31)
+        # Dane treningowe mogą pochodzić z zewnątrz (np. MemoryMappedXORDataset lub StreamingXORDataset z pliku),
+        # wtedy nie generujemy ich w pamięci
+        if dataset is not None:
+            self.data_loader = dataset
+        else:
+            self.data_loader = XORDataCreator(data_size=250, noise_std_deviation=0.1, seed=self.data_seed)
+        # Metryki zapisujemy do TensorBoard co log_every_steps epok lub co log_every_seconds sekund
+        self.log_dir = 'logs/'
+        self.log_every_steps = 10
+        self.log_every_seconds = 5.0
+        # Profilowanie jest domyślnie wyłączone, włącza je set_profiling
+        self.profiling = dict(enabled=False)
+        # Punkty kontrolne są domyślnie wyłączone, włącza je set_checkpointing
+        self.checkpointing = None
+ 
+    def train_and_log(self, model: ClassifierModel, epochs_num: int=150, batch_size: int=32, shuffle: bool=True,
+                      num_workers: int=0, pin_memory: bool=None, prefetch_factor: int=2, resume: bool=False,
+                      lr: float=0.1, epoch_callback=None):
+        # epoch_callback(epoka, średni_błąd) jest wywoływany po każdej epoce, zwrócenie True przerywa trening
+        # (np. przy odrzucaniu słabych konfiguracji w sweep.py). Odczyt błędu wymusza synchronizację z GPU.
+        # Zwraca liczbę wykonanych epok
  
-    def train_and_log(self, model: ClassifierModel, epochs_num: int=150):
         # Sprawdźmy czy możemy wykorzystać GPU poprzez pakiet CUDA celem przyspieszenia obliczeń
         gpu_available = torch.cuda.is_available()
         # W przypadku możliwości ustawmy 'device' na GPU
         device = torch.device('cuda') if gpu_available else torch.device('cpu')
  
-        # Inicjalizacja
-        self.loss_calculation_model = nn.BCEWithLogitsLoss()
-        self.optimizer = torch.optim.SGD(model.parameters(), lr=0.1)
+        # Wznowienie treningu z najnowszego poprawnego punktu kontrolnego (o ile istnieje)
+        checkpoints = CheckpointManager(**self.checkpointing) if self.checkpointing is not None else None
+        checkpoint = checkpoints.load_latest() if checkpoints is not None and resume else None
+        start_epoch = 0
+        if checkpoint is not None:
+            model.load_state_dict(checkpoint['model'])
+            start_epoch = checkpoint['epoch']
+            if isinstance(self.data_loader, XORDataCreator) and checkpoint['data_seed'] not in (None, self.data_seed):
+                self.data_seed = checkpoint['data_seed']
+                self.data_loader = XORDataCreator(self.data_loader.data_size, self.data_loader.noise_std_deviation,
+                                                  seed=self.data_seed, chunk_size=self.data_loader.chunk_size)
+        if start_epoch >= epochs_num:
+            if checkpoint is not None:
+                print(f"Punkt kontrolny jest z epoki {start_epoch}, trening do epoki {epochs_num} jest już zakończony")
+            if checkpoints is not None:
+                checkpoints.close()
+            return 0
  
         # Załadujmy nasz model do GPU jeśli jest dostępne
         model.to(device)
         # Ustawmy model w tryb treningowy (funkcjonalność odziedziczona po klasie nn.Module)
         model.train()
  
-        # Inicjalizacja loggera TensorBoard, logi zapisujemy do folderu 'logs'
-        tensorboard_logger = SummaryWriter('logs/')
+        # Inicjalizacja - optymalizator tworzymy tylko raz (lub bierzemy ustawiony przez set_optimizer),
+        # więc kolejne wywołania train_and_log kontynuują z jego dotychczasowym stanem
+        if self.loss_calculation_model is None:
+            self.loss_calculation_model = nn.BCEWithLogitsLoss()
+        if self.optimizer is None:
+            self.optimizer = torch.optim.SGD(model.parameters(), lr=lr)
+        if checkpoint is not None:
+            self.optimizer.load_state_dict(checkpoint['optimizer'])
+            # Stan generatorów losowych na końcu zapisanej epoki - kolejne epoki losują tak samo jak bez przerwy
+            set_rng_state(checkpoint['rng'])
+ 
+        # DataLoader dzieli dane na paczki po batch_size próbek. Przy num_workers > 0 paczki są przygotowywane
+        # w osobnych procesach (prefetch_factor paczek na proces z wyprzedzeniem), a pin_memory pozwala
+        # kopiować je do GPU asynchronicznie
+        if pin_memory is None:
+            pin_memory = gpu_available
+        loader_options = dict(batch_size=batch_size, shuffle=shuffle, num_workers=num_workers, pin_memory=pin_memory)
+        if hasattr(self.data_loader, '__getitems__'):
+            loader_options['collate_fn'] = collate_batch
+        if isinstance(self.data_loader, data.IterableDataset):
+            # Zbiór strumieniowy sam dzieli dane na paczki (i ewentualnie je miesza), DataLoader tylko je przekazuje
+            loader_options.update(batch_size=None, shuffle=False, collate_fn=collate_batch)
+        if num_workers > 0:
+            loader_options.update(prefetch_factor=prefetch_factor, persistent_workers=True)
+        batches = data.DataLoader(self.data_loader, **loader_options)
+ 
+        # Inicjalizacja loggera TensorBoard, logi zapisujemy do folderu 'logs' w osobnym wątku
+        tensorboard_logger = AsyncMetricsLogger(self.log_dir, self.log_every_steps, self.log_every_seconds)
         tensorboard_initialized = False
  
-        # Pętla treningowa (pobierz paczkę danych treningowych)
-        for current_epoch in range(epochs_num):
-            epoch_loss = 0.0
-            for data_inputs, data_labels in self.data_loader:
-                # Załadujmy nasze dane do GPU jeśli jest w użyciu
-                data_inputs = data_inputs.to(device)
-                data_labels = data_labels.to(device)
+        # Opcjonalny profiler pętli treningowej, wyniki zapisujemy do folderu z logami
+        with TrainingProfiler(log_dir=self.log_dir, **self.profiling) as profiler:
+            # Pętla treningowa (pobierz paczkę danych treningowych)
+            for current_epoch in range(start_epoch, epochs_num):
+                # Błąd sumujemy na urządzeniu, odczytujemy go tylko raz na epokę (każdy odczyt wymusza synchronizację z GPU)
+                epoch_loss = torch.zeros((), device=device)
+                batches_iterator = iter(batches)
+                while True:
+                    with tensorboard_logger.phase('dane'), profiler.phase('dane'):
+                        batch = next(batches_iterator, None)
+                        if batch is None:
+                            break
+                        # Załadujmy nasze dane do GPU jeśli jest w użyciu
+                        data_inputs = batch[0].to(device, non_blocking=pin_memory)
+                        data_labels = batch[1].to(device, non_blocking=pin_memory)
  
-                if not tensorboard_initialized:
-                    # Inicjalizacja grafu odbywa się tylko raz, kolekcja data_inputs się nie zmienia,
-                    # nie ma potrzeby inicjalizować ponownie
-                    tensorboard_logger.add_graph(model, data_inputs)
-                    tensorboard_initialized = True
+                    if not tensorboard_initialized:
+                        # Inicjalizacja grafu odbywa się tylko raz, kolekcja data_inputs się nie zmienia,
+                        # nie ma potrzeby inicjalizować ponownie
+                        tensorboard_logger.add_graph(model, data_inputs)
+                        tensorboard_initialized = True
  
-                # Przeprocedujmy dane wejściowe przez nasz model
-                predicted_output = model(data_inputs)
-                predicted_output = predicted_output[0]
+                    with tensorboard_logger.phase('forward'), profiler.phase('forward'):
+                        # Przeprocedujmy dane wejściowe przez nasz model (jedno wyjście na każdą próbkę z paczki)
+                        predicted_output = model(data_inputs)
+                        predicted_output = predicted_output.squeeze(dim=1)
  
-                # Obliczmy wartość funkcji straty (jak bardzo nasz model się pomylił)
-                loss = self.loss_calculation_model(predicted_output, data_labels.float())
+                        # Obliczmy wartość funkcji straty (jak bardzo nasz model się pomylił)
+                        loss = self.loss_calculation_model(predicted_output, data_labels.float())
  
-                # Wyzerujmy wartość gradientu na wszelki wypadek
-                self.optimizer.zero_grad()
+                    with tensorboard_logger.phase('backward'), profiler.phase('backward'):
+                        # Wyzerujmy wartość gradientu na wszelki wypadek
+                        self.optimizer.zero_grad(set_to_none=True)
  
-                # Dokonajmy propagacji wstecznej błędu
-                loss.backward()
+                        # Dokonajmy propagacji wstecznej błędu
+                        loss.backward()
  
-                # Zaktualizujmy wagi sieci na podstawie obliczonego gradientu
-                self.optimizer.step()
+                    with tensorboard_logger.phase('optymalizator'), profiler.phase('optymalizator'):
+                        # Zaktualizujmy wagi sieci na podstawie obliczonego gradientu
+                        self.optimizer.step()
  
-                # Obliczenie średniej pomyłki obecnej iteracji treningowej
-                epoch_loss += loss.item()
+                    # Suma błędów wszystkich próbek z paczki
+                    epoch_loss += loss.detach() * len(data_labels)
+                    tensorboard_logger.count_samples(len(data_labels))
+                    profiler.step()
  
-                # Dodanie kolejnego punktu na wykresie obrazującym błąd sieci
-                tensorboard_logger.add_scalar('blad', epoch_loss, global_step = current_epoch + 1)
+                with tensorboard_logger.phase('logowanie'), profiler.phase('logowanie'):
+                    # Dodanie kolejnego punktu na wykresie obrazującym średni błąd sieci w epoce. Tensor jest zamieniany
+                    # na liczbę dopiero w wątku loggera, więc pętla nie czeka na synchronizację z GPU
+                    tensorboard_logger.add_scalar('blad', epoch_loss / len(self.data_loader), global_step = current_epoch + 1)
  
+                if checkpoints is not None and checkpoints.due(current_epoch + 1, epochs_num):
+                    with tensorboard_logger.phase('punkt_kontrolny'), profiler.phase('punkt_kontrolny'):
+                        # Tylko kopia stanu w pamięci, zapis na dysk odbywa się w wątku CheckpointManager
+                        checkpoints.save(current_epoch + 1, model, self.optimizer, self.data_seed)
+ 
+                if epoch_callback is not None and epoch_callback(current_epoch + 1, (epoch_loss / len(self.data_loader)).item()):
+                    break
+ 
+        if checkpoints is not None:
+            checkpoints.close()
         tensorboard_logger.close()
+        return current_epoch + 1 - start_epoch
+ 
+    def set_logging(self, log_dir, log_every_steps: int=10, log_every_seconds: float=5.0) -> None:
+        self.log_dir = log_dir
+        self.log_every_steps = log_every_steps
+        self.log_every_seconds = log_every_seconds
+ 
+    # Włączenie profilowania treningu - parametry harmonogramu jak w TrainingProfiler
+    def set_profiling(self, enabled: bool=True, wait: int=1, warmup: int=1, active: int=5, repeat: int=1) -> None:
+        self.profiling = dict(enabled=enabled, wait=wait, warmup=warmup, active=active, repeat=repeat)
+ 
+    # Włączenie punktów kontrolnych - co every_epochs epok, w katalogu zostaje keep_last najnowszych plików
+    def set_checkpointing(self, checkpoint_dir='checkpoints/', every_epochs: int=10, keep_last: int=3) -> None:
+        self.checkpointing = dict(checkpoint_dir=checkpoint_dir, every_epochs=every_epochs, keep_last=keep_last)
  
     def set_optimizer(self, optimizer) -> None:
         self.optimizer = optimizer
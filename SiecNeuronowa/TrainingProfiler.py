@@ -0,0 +1,95 @@
+import os
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+import torch
+from torch.profiler import ProfilerActivity, profile, record_function, schedule
+
+class TrainingProfiler():
+
+    """
+    TrainingProfiler jest opcjonalnym profilerem pętli treningowej. Gdy jest włączony, pętla jest profilowana przez
+    torch.profiler (CPU) według harmonogramu wait / warmup / active / repeat kroków - pomijamy pierwsze kroki
+    (wait), rozgrzewamy profiler (warmup) i zapisujemy tylko active kroków, więc narzut profilowania dotyczy
+    niewielkiej części treningu. Fazy treningu (phase) są oznaczone w śladzie przez record_function i dodatkowo
+    mierzone zegarem przez cały trening. Wyniki trafiają do katalogu log_dir (obok logów TensorBoard):
+    - profile_trace_<krok>.json - ślad w formacie Chrome trace (chrome://tracing lub https://ui.perfetto.dev),
+    - profile_summary.txt - tabela najdroższych operacji oraz łączne czasy faz treningu.
+    Gdy profiler jest wyłączony, phase i step nic nie robią.
+    """
+
+    def __init__(self, enabled: bool=False, log_dir='logs/', wait: int=1, warmup: int=1, active: int=5,
+                 repeat: int=1, row_limit: int=20) -> None:
+        self.enabled = enabled
+        self.log_dir = log_dir
+        self.schedule = schedule(wait=wait, warmup=warmup, active=active, repeat=repeat)
+        self.row_limit = row_limit
+        self.profiler = None
+        self.steps = 0
+        self.phase_times = defaultdict(float)
+        self.phase_counts = defaultdict(int)
+        self.disabled_phase = nullcontext()
+
+    def __enter__(self):
+        if self.enabled:
+            os.makedirs(self.log_dir, exist_ok=True)
+            self.profiler = profile(activities=[ProfilerActivity.CPU], schedule=self.schedule,
+                                    on_trace_ready=self.save_trace)
+            self.profiler.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.profiler is None:
+            return
+        try:
+            self.profiler.__exit__(exc_type, exc_value, traceback)
+            # Bez ani jednego kroku (trening krótszy niż harmonogram, wznowienie zakończonego treningu)
+            # profiler nie ma czego podsumować - key_averages() rzuciłoby AssertionError
+            if self.steps > 0:
+                self.save_summary()
+        except Exception as e:
+            # Błąd profilera nie może przykryć wyjątku, który przerwał trening
+            if exc_type is None:
+                raise
+            print(f'Nie udało się zapisać wyników profilera: {e}')
+        finally:
+            self.profiler = None
+
+    def phase(self, name):
+        if not self.enabled:
+            return self.disabled_phase
+        return self.timed_phase(name)
+
+    @contextmanager
+    def timed_phase(self, name):
+        start = time.perf_counter()
+        with record_function(name):
+            yield
+        self.phase_times[name] += time.perf_counter() - start
+        self.phase_counts[name] += 1
+
+    # Koniec kroku treningowego (jednej paczki danych)
+    def step(self) -> None:
+        if self.profiler is not None:
+            self.profiler.step()
+            self.steps += 1
+
+    def save_trace(self, profiler) -> None:
+        profiler.export_chrome_trace(os.path.join(self.log_dir, f'profile_trace_{profiler.step_num}.json'))
+
+    def save_summary(self) -> None:
+        lines = ['Najdroższe operacje (aktywne kroki profilera):',
+                 self.profiler.key_averages().table(sort_by='self_cpu_time_total', row_limit=self.row_limit),
+                 '',
+                 'Czasy faz treningu (cały trening):',
+                 f'{"faza":<16}{"wywołania":>12}{"suma [s]":>14}{"średnio [ms]":>16}{"udział":>10}']
+        total = sum(self.phase_times.values()) or 1.0
+        for name, seconds in sorted(self.phase_times.items(), key=lambda item: item[1], reverse=True):
+            count = self.phase_counts[name]
+            lines.append(f'{name:<16}{count:>12}{seconds:>14.4f}{1000 * seconds / count:>16.4f}{seconds / total:>10.1%}')
+        summary = '\n'.join(lines)
+
+        with open(os.path.join(self.log_dir, 'profile_summary.txt'), 'w') as f:
+            f.write(summary + '\n')
+        print(summary)
@@ -0,0 +1,131 @@
+import argparse
+import time
+from os.path import splitext
+import numpy as np
+import torch
+import torch.nn as nn
+from SimpleNeuronChain import ClassifierModel
+
+__clasifier_model_state_file_name__ = "classifier_model.pt"
+
+# Wczytanie wytrenowanego modelu (raz) i przełączenie go w tryb ewaluacji
+def load_classifier(model_file=__clasifier_model_state_file_name__, hidden_layer_neurons_number: int=5,
+                    device='cpu') -> ClassifierModel:
+    model = ClassifierModel(inputs_number=2, hidden_layer_neurons_number=hidden_layer_neurons_number, outputs_number=1)
+    model.load_state_dict(torch.load(model_file, map_location=device, weights_only=True))
+    model.to(device)
+    model.eval()
+    return model
+
+# Prawdopodobieństwo wyniku 1 operacji XOR dla każdej pary liczb z inputs (tensor N x 2). Dane są przetwarzane
+# paczkami po batch_size par w trybie inference_mode (bez śledzenia gradientów), wynik trafia do jednego tensora
+@torch.inference_mode()
+def predict(model, inputs, batch_size: int=65536, device='cpu') -> torch.Tensor:
+    inputs = torch.as_tensor(inputs, dtype=torch.float32)
+    probabilities = torch.empty(len(inputs), dtype=torch.float32)
+    for start in range(0, len(inputs), batch_size):
+        batch = inputs[start:start + batch_size].to(device)
+        probabilities[start:start + len(batch)] = torch.sigmoid(model(batch).squeeze(dim=1)).cpu()
+    return probabilities
+
+# Dane wejściowe z pliku .npy, .pt lub .csv (dwie kolumny liczb)
+def load_inputs(input_file) -> torch.Tensor:
+    extension = splitext(input_file)[1].lower()
+    if extension == '.npy':
+        return torch.from_numpy(np.load(input_file).astype(np.float32, copy=False))
+    if extension == '.pt':
+        return torch.load(input_file, weights_only=True).float()
+    return torch.from_numpy(np.loadtxt(input_file, delimiter=',', dtype=np.float32, ndmin=2))
+
+def save_predictions(output_file, probabilities) -> None:
+    extension = splitext(output_file)[1].lower()
+    if extension == '.npy':
+        np.save(output_file, probabilities.numpy())
+    elif extension == '.pt':
+        torch.save(probabilities, output_file)
+    else:
+        np.savetxt(output_file, probabilities.numpy(), delimiter=',', fmt='%.6f')
+
+# Wersja modelu do wdrożenia:
+# - 'eager' - zwykły model PyTorch,
+# - 'torchscript' - model skompilowany przez torch.jit.script, można go zapisać do pliku i wczytać bez kodu Pythona,
+# - 'compile' - model skompilowany przez torch.compile (kompilacja odbywa się przy pierwszym wywołaniu).
+# quantize zamienia warstwy liniowe na dynamicznie kwantyzowane int8 (tylko CPU).
+def export_model(model, mode: str='torchscript', quantize: bool=False, output_file=None):
+    if quantize:
+        model = torch.ao.quantization.quantize_dynamic(model, {nn.Linear}, dtype=torch.qint8)
+    if mode == 'eager':
+        exported = model
+    elif mode == 'torchscript':
+        exported = torch.jit.script(model)
+        if output_file is not None:
+            exported.save(output_file)
+    elif mode == 'compile':
+        exported = torch.compile(model)
+    else:
+        raise ValueError(f"Nieznany tryb eksportu modelu: {mode}")
+    return exported
+
+# Porównanie opóźnienia i przepustowości wersji modelu dla różnych rozmiarów paczki danych
+@torch.inference_mode()
+def benchmark(models: dict, batch_sizes=(1, 64, 4096, 65536), repeats: int=50, warmup: int=5) -> list:
+    results = list()
+    for batch_size in batch_sizes:
+        inputs = torch.randint(0, 2, (batch_size, 2)).float() + 0.1 * torch.randn(batch_size, 2)
+        for name, model in models.items():
+            try:
+                for i in range(warmup):
+                    model(inputs)
+                start = time.perf_counter()
+                for i in range(repeats):
+                    model(inputs)
+                elapsed = (time.perf_counter() - start) / repeats
+            except Exception as e:
+                print(f"{name} (paczka {batch_size}) niedostępny: {e}")
+                continue
+            results.append(dict(model=name, batch_size=batch_size, latency_ms=1000 * elapsed,
+                                samples_per_second=batch_size / elapsed))
+
+    print(f'{"model":<22}{"paczka":>10}{"opóźnienie [ms]":>18}{"próbki/s":>16}')
+    for row in results:
+        print(f'{row["model"]:<22}{row["batch_size"]:>10}{row["latency_ms"]:>18.4f}{row["samples_per_second"]:>16.0f}')
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Inferencja klasyfikatora XOR")
+    parser.add_argument("--model", default=__clasifier_model_state_file_name__, help="plik ze stanem modelu")
+    parser.add_argument("--hidden", type=int, default=5, help="liczba neuronów warstwy ukrytej")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    predict_parser = commands.add_parser("predict", help="predykcja dla danych z pliku")
+    predict_parser.add_argument("input", help="dane wejściowe (.npy, .pt lub .csv)")
+    predict_parser.add_argument("output", help="plik z prawdopodobieństwami (.npy, .pt lub .csv)")
+    predict_parser.add_argument("--batch-size", type=int, default=65536)
+
+    export_parser = commands.add_parser("export", help="zapis modelu TorchScript")
+    export_parser.add_argument("output", help="plik modelu TorchScript")
+    export_parser.add_argument("--quantize", action="store_true", help="dynamiczna kwantyzacja int8")
+
+    benchmark_parser = commands.add_parser("benchmark", help="porównanie wersji eager / TorchScript / torch.compile")
+    benchmark_parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 64, 4096, 65536])
+    benchmark_parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    model = load_classifier(args.model, args.hidden)
+    if args.command == "predict":
+        inputs = load_inputs(args.input)
+        start = time.perf_counter()
+        probabilities = predict(model, inputs, args.batch_size)
+        elapsed = time.perf_counter() - start
+        save_predictions(args.output, probabilities)
+        print(f"{len(inputs)} predykcji w {elapsed:.3f} s zapisano do {args.output}")
+    elif args.command == "export":
+        export_model(model, 'torchscript', args.quantize, args.output)
+        print(f"Model TorchScript zapisano do {args.output}")
+    else:
+        benchmark({
+            'eager': model,
+            'torchscript': export_model(model, 'torchscript'),
+            'compile': export_model(model, 'compile'),
+            'eager int8': export_model(model, 'eager', quantize=True),
+        }, args.batch_sizes, args.repeats)
@@ -0,0 +1,167 @@
+import argparse
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+from os.path import exists
+import torch
+from SimpleNeuronChain import ClassifierModel
+from inference import __clasifier_model_state_file_name__, load_classifier
+
+class MicroBatcher():
+
+    """
+    MicroBatcher łączy pojedyncze, współbieżne zapytania w paczki (micro-batching). Pierwsze zapytanie w kolejce
+    otwiera paczkę, do której trafiają kolejne zapytania, dopóki paczka nie osiągnie max_batch_size par
+    lub nie minie max_wait_ms milisekund. Cała paczka jest liczona jednym wywołaniem modelu w osobnym wątku,
+    więc pętla asyncio w tym czasie dalej przyjmuje zapytania. Większe max_wait_ms daje większe paczki i wyższą
+    przepustowość kosztem opóźnienia pojedynczego zapytania.
+    """
+
+    def __init__(self, model, max_batch_size: int=32, max_wait_ms: float=2.0) -> None:
+        self.model = model
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.queue = asyncio.Queue()
+        self.executor = ThreadPoolExecutor(max_workers=1)
+        self.batches = 0
+        self.requests = 0
+
+    async def predict(self, inputs) -> float:
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((inputs, future))
+        return await future
+
+    async def collect_batch(self) -> list:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            # Najpierw zapytania, które już czekają w kolejce, potem czekamy na kolejne do upływu terminu
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    @torch.inference_mode()
+    def forward(self, inputs) -> list:
+        return torch.sigmoid(self.model(inputs).squeeze(dim=1)).tolist()
+
+    async def run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self.collect_batch()
+            try:
+                inputs = torch.tensor([inputs for inputs, future in batch], dtype=torch.float32)
+                probabilities = await loop.run_in_executor(self.executor, self.forward, inputs)
+            except Exception as e:
+                for inputs, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.requests += len(batch)
+            for (inputs, future), probability in zip(batch, probabilities):
+                if not future.done():
+                    future.set_result(probability)
+
+async def send_response(writer, status: int, payload: dict, keep_alive: bool) -> None:
+    reasons = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 500: 'Internal Server Error'}
+    body = json.dumps(payload).encode()
+    headers = (f"HTTP/1.1 {status} {reasons[status]}\r\n"
+               f"Content-Type: application/json\r\n"
+               f"Content-Length: {len(body)}\r\n"
+               f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    writer.write(headers.encode() + body)
+    await writer.drain()
+
+# Minimalny serwer HTTP/1.1 z keep-alive:
+# - POST /predict z ciałem {"inputs": [x0, x1]} zwraca {"probability": p, "label": 0 lub 1},
+# - GET /health zwraca statystyki paczek.
+async def handle_connection(reader, writer, batcher: MicroBatcher) -> None:
+    try:
+        while True:
+            request_line = await reader.readline()
+            if not request_line:
+                break
+            method, path, version = request_line.decode().split(' ', 2)
+            headers = dict()
+            while True:
+                line = await reader.readline()
+                if line in (b'\r\n', b'\n', b''):
+                    break
+                key, value = line.decode().split(':', 1)
+                headers[key.strip().lower()] = value.strip()
+            body = await reader.readexactly(int(headers.get('content-length', 0)))
+            keep_alive = headers.get('connection', '').lower() != 'close'
+
+            if method == 'POST' and path == '/predict':
+                try:
+                    inputs = [float(x) for x in json.loads(body)['inputs']]
+                    if len(inputs) != 2:
+                        raise ValueError("inputs musi zawierać dwie liczby")
+                except (ValueError, KeyError, TypeError) as e:
+                    await send_response(writer, 400, {'error': str(e)}, keep_alive)
+                else:
+                    try:
+                        probability = await batcher.predict(inputs)
+                        await send_response(writer, 200, {'probability': probability, 'label': int(probability > 0.5)},
+                                            keep_alive)
+                    except Exception as e:
+                        await send_response(writer, 500, {'error': str(e)}, keep_alive)
+            elif method == 'GET' and path == '/health':
+                average = batcher.requests / batcher.batches if batcher.batches else 0.0
+                await send_response(writer, 200, {'status': 'ok', 'batches': batcher.batches,
+                                                  'requests': batcher.requests, 'average_batch_size': average},
+                                    keep_alive)
+            else:
+                await send_response(writer, 404, {'error': f'{method} {path}'}, keep_alive)
+
+            if not keep_alive:
+                break
+    except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+        pass
+    finally:
+        writer.close()
+
+async def serve(model, host: str='127.0.0.1', port: int=8000, max_batch_size: int=32, max_wait_ms: float=2.0) -> None:
+    batcher = MicroBatcher(model, max_batch_size, max_wait_ms)
+    batcher_task = asyncio.create_task(batcher.run())
+    server = await asyncio.start_server(lambda reader, writer: handle_connection(reader, writer, batcher), host, port)
+    print(f"Serwer klasyfikatora XOR na http://{host}:{port} (paczka do {max_batch_size}, czekanie do {max_wait_ms} ms)",
+          flush=True)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        batcher_task.cancel()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Serwer HTTP klasyfikatora XOR z łączeniem zapytań w paczki")
+    parser.add_argument("--model", default=__clasifier_model_state_file_name__, help="plik ze stanem modelu")
+    parser.add_argument("--hidden", type=int, default=5, help="liczba neuronów warstwy ukrytej")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--max-batch-size", type=int, default=32)
+    parser.add_argument("--max-wait-ms", type=float, default=2.0)
+    parser.add_argument("--threads", type=int, default=1, help="liczba wątków obliczeń PyTorch")
+    args = parser.parse_args()
+
+    torch.set_num_threads(args.threads)
+    if exists(args.model):
+        model = load_classifier(args.model, args.hidden)
+    else:
+        # Do testów obciążeniowych wagi modelu nie mają znaczenia
+        print(f"Brak pliku {args.model}, serwer używa niewytrenowanego modelu")
+        model = ClassifierModel(inputs_number=2, hidden_layer_neurons_number=args.hidden, outputs_number=1).eval()
+
+    try:
+        asyncio.run(serve(model, args.host, args.port, args.max_batch_size, args.max_wait_ms))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,130 @@
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import numpy as np
+
+# Generator obciążenia dla inference_server.py. concurrency klientów wysyła w sumie requests pojedynczych zapytań
+# POST /predict przez stałe połączenia (keep-alive), każdy klient czeka na odpowiedź przed wysłaniem kolejnego
+# zapytania. Raport zawiera percentyle opóźnienia p50 / p95 / p99 i liczbę zapytań na sekundę.
+# Z opcją --sweep generator sam uruchamia serwer (w osobnym procesie) dla każdego ustawienia paczek
+# "max_batch_size:max_wait_ms" i porównuje wyniki.
+
+# Serwer leży obok tego pliku - generator można uruchomić z dowolnego katalogu
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inference_server.py')
+
+async def read_response(reader) -> dict:
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Serwer zamknął połączenie")
+    headers = dict()
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        key, value = line.decode().split(':', 1)
+        headers[key.strip().lower()] = value.strip()
+    body = await reader.readexactly(int(headers.get('content-length', 0)))
+    status = int(status_line.split()[1])
+    if status != 200:
+        raise RuntimeError(f"HTTP {status}: {body.decode()}")
+    return json.loads(body)
+
+async def client(host: str, port: int, requests_queue, latencies: list, errors: list) -> None:
+    reader, writer = await asyncio.open_connection(host, port)
+    try:
+        while True:
+            try:
+                requests_queue.get_nowait()
+            except asyncio.QueueEmpty:
+                break
+            body = json.dumps({'inputs': [random.randint(0, 1) + random.gauss(0, 0.1),
+                                          random.randint(0, 1) + random.gauss(0, 0.1)]}).encode()
+            request = (f"POST /predict HTTP/1.1\r\nHost: {host}\r\nContent-Type: application/json\r\n"
+                       f"Content-Length: {len(body)}\r\n\r\n").encode() + body
+            start = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            try:
+                await read_response(reader)
+            except RuntimeError as e:
+                errors.append(str(e))
+                continue
+            latencies.append(time.perf_counter() - start)
+    finally:
+        writer.close()
+
+async def run_load(host: str, port: int, concurrency: int, requests: int) -> dict:
+    requests_queue = asyncio.Queue()
+    for i in range(requests):
+        requests_queue.put_nowait(i)
+    latencies, errors = list(), list()
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, requests_queue, latencies, errors) for i in range(concurrency)])
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = 1000 * np.array(latencies)
+    p50, p95, p99 = np.percentile(latencies_ms, [50, 95, 99]) if len(latencies) else (float('nan'),) * 3
+    return dict(requests=len(latencies), errors=len(errors), seconds=elapsed, requests_per_second=len(latencies) / elapsed,
+                p50_ms=p50, p95_ms=p95, p99_ms=p99)
+
+def print_report(rows: list) -> None:
+    print(f'{"ustawienie":<16}{"zapytania":>11}{"błędy":>8}{"zapytania/s":>14}{"p50 [ms]":>11}{"p95 [ms]":>11}{"p99 [ms]":>11}')
+    for row in rows:
+        print(f'{row["setting"]:<16}{row["requests"]:>11}{row["errors"]:>8}{row["requests_per_second"]:>14.1f}'
+              f'{row["p50_ms"]:>11.2f}{row["p95_ms"]:>11.2f}{row["p99_ms"]:>11.2f}')
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+# Uruchomienie serwera w osobnym procesie i czekanie, aż zacznie przyjmować połączenia
+def start_server(port: int, max_batch_size: int, max_wait_ms: float, model_file: str) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, SERVER_SCRIPT, '--port', str(port), '--model', model_file,
+                               '--max-batch-size', str(max_batch_size), '--max-wait-ms', str(max_wait_ms)],
+                              stdout=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return server
+        except OSError:
+            if server.poll() is not None:
+                break
+            time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"Serwer na porcie {port} nie wystartował")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generator obciążenia serwera klasyfikatora XOR")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--concurrency", type=int, default=64, help="liczba współbieżnych klientów")
+    parser.add_argument("--requests", type=int, default=5000, help="łączna liczba zapytań")
+    parser.add_argument("--sweep", nargs="+", metavar="BATCH:WAIT_MS",
+                        help="ustawienia paczek serwera do porównania, np. 1:0 8:1 32:2 - serwer jest uruchamiany lokalnie")
+    parser.add_argument("--model", default="classifier_model.pt", help="plik modelu dla serwerów z --sweep")
+    args = parser.parse_args()
+
+    rows = list()
+    if not args.sweep:
+        result = asyncio.run(run_load(args.host, args.port, args.concurrency, args.requests))
+        rows.append(dict(setting=f"{args.host}:{args.port}", **result))
+    else:
+        for setting in args.sweep:
+            max_batch_size, max_wait_ms = setting.split(':')
+            port = free_port()
+            server = start_server(port, int(max_batch_size), float(max_wait_ms), args.model)
+            try:
+                result = asyncio.run(run_load('127.0.0.1', port, args.concurrency, args.requests))
+            finally:
+                server.terminate()
+                server.wait()
+            rows.append(dict(setting=setting, **result))
+    print_report(rows)
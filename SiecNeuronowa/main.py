@@ -1,9 +1,24 @@
+import argparse
+import sys
 from os.path import exists
 import torch
 from SimpleNeuronChain import *
+from MemoryMappedData import MemoryMappedXORDataset, StreamingXORDataset, write_xor_dataset
  
 __clasifier_model_state_file_name__ = "classifier_model.pt"
  
+parser = argparse.ArgumentParser(description="Trening klasyfikatora XOR")
+parser.add_argument("--profile", action="store_true",
+                    help="profiluj pętlę treningową (ślad Chrome i podsumowanie w folderze logs/)")
+parser.add_argument("--resume", action="store_true",
+                    help="wznów trening z najnowszego poprawnego punktu kontrolnego")
+parser.add_argument("--checkpoint-dir", help="zapisuj punkty kontrolne w tym folderze (przy --resume domyślnie checkpoints/)")
+parser.add_argument("--checkpoint-every", type=int, default=10, help="co ile epok zapisywać punkt kontrolny")
+parser.add_argument("--data-file", help="plik .npy z próbkami treningowymi (tworzony przy pierwszym uruchomieniu)")
+parser.add_argument("--data-size", type=int, default=1000000, help="liczba próbek tworzonego pliku danych")
+parser.add_argument("--stream", action="store_true", help="czytaj plik danych sekwencyjnie (IterableDataset)")
+args = parser.parse_args()
+ 
 classifier_model = ClassifierModel(inputs_number=2, hidden_layer_neurons_number=5, outputs_number=1)
  
 # Wczytaj poprzednio zapisany model, jeśli istnieje
@@ -12,8 +27,25 @@ if exists(__clasifier_model_state_file_name__):
     classifier_model.load_state_dict(model_state)
     print("Pretrained model loaded from ", __clasifier_model_state_file_name__)
  
-net_model = Net()
-net_model.train_and_log(model=classifier_model)
+# Dane z pliku zmapowanego w pamięci zamiast generowanych przy każdym uruchomieniu
+dataset = None
+if args.data_file is not None:
+    if not exists(args.data_file):
+        write_xor_dataset(args.data_file, args.data_size, noise_std_deviation=0.1)
+        print("Training data written to ", args.data_file)
+    if args.stream:
+        dataset = StreamingXORDataset(args.data_file, batch_size=32, shuffle=True)
+    else:
+        dataset = MemoryMappedXORDataset(args.data_file)
+ 
+net_model = Net(dataset=dataset)
+if args.profile:
+    net_model.set_profiling()
+# Punkty kontrolne tylko na życzenie - folderem z --checkpoint-dir albo wznowieniem treningu
+if args.checkpoint_dir is not None or args.resume:
+    net_model.set_checkpointing(args.checkpoint_dir or "checkpoints/", args.checkpoint_every)
+if net_model.train_and_log(model=classifier_model, resume=args.resume) == 0:
+    sys.exit("Nie wykonano żadnej epoki treningu - model nie został zapisany")
  
 # Zapisz dotychczasowy model
 model_state = classifier_model.state_dict()
@@ -0,0 +1,189 @@
+import argparse
+import csv
+import itertools
+import json
+import math
+import multiprocessing
+import os
+import random
+import statistics
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+# Przestrzeń przeszukiwania hiperparametrów klasyfikatora XOR. Lista oznacza wartości do wyboru (siatka
+# lub losowanie), krotka (dolna, górna) - przedział losowania (liczby całkowite równomiernie, zmiennoprzecinkowe
+# w skali logarytmicznej), krotki są dostępne tylko w przeszukiwaniu losowym
+default_space = dict(
+    hidden_layer_neurons_number=[2, 3, 5, 8],
+    lr=[0.01, 0.05, 0.1, 0.5],
+    batch_size=[16, 32, 64],
+)
+
+# Wartości używane, gdy konfiguracja ich nie podaje
+default_config = dict(hidden_layer_neurons_number=5, lr=0.1, batch_size=32, epochs_num=150, data_size=250,
+                      noise_std_deviation=0.1, seed=0)
+
+def grid_search(space: dict) -> list:
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+def sample_value(values, rng: random.Random):
+    if isinstance(values, tuple):
+        low, high = values
+        if isinstance(low, int) and isinstance(high, int):
+            return rng.randint(low, high)
+        return math.exp(rng.uniform(math.log(low), math.log(high)))
+    return rng.choice(values)
+
+def random_search(space: dict, trials: int, seed=None) -> list:
+    rng = random.Random(seed)
+    return [{name: sample_value(values, rng) for name, values in space.items()} for i in range(trials)]
+
+# Przestrzeń z JSON - obiekt {"low": ..., "high": ...} oznacza przedział
+def parse_space(text) -> dict:
+    space = json.loads(text)
+    return {name: (values['low'], values['high']) if isinstance(values, dict) else values
+            for name, values in space.items()}
+
+# Każdy proces próby dostaje stały przydział wątków PyTorch, żeby próby nie walczyły o rdzenie procesora.
+# Krótki trening na rozgrzewkę (importy, pierwsze wywołania operacji torch, logger TensorBoard) odbywa się przed
+# pierwszą próbą, więc nie wlicza się do czasu żadnej z nich
+def init_trial_worker(threads: int) -> None:
+    import tempfile
+    import torch
+    from SimpleNeuronChain import ClassifierModel, Net, XORDataCreator
+
+    torch.set_num_threads(threads)
+    torch.set_num_interop_threads(1)
+    with tempfile.TemporaryDirectory() as log_dir:
+        net_model = Net(data_seed=0, dataset=XORDataCreator(64, 0.1, seed=0))
+        net_model.set_logging(log_dir)
+        net_model.train_and_log(ClassifierModel(inputs_number=2, hidden_layer_neurons_number=2, outputs_number=1),
+                                epochs_num=2, batch_size=32)
+
+class MedianPruner():
+
+    """
+    MedianPruner przerywa próbę, której średni błąd w epoce jest wyższy niż mediana błędów innych prób
+    w tej samej epoce. Błędy wszystkich prób trafiają do słownika współdzielonego między procesami
+    (multiprocessing.Manager). Decyzja zapada co check_every epok, dopiero od epoki warmup_epochs i gdy
+    tę epokę osiągnęło co najmniej min_trials innych prób - wcześniejsze porównania są zbyt przypadkowe.
+    """
+
+    def __init__(self, losses, trial: int, warmup_epochs: int=20, check_every: int=10, min_trials: int=3) -> None:
+        self.losses = losses
+        self.trial = trial
+        self.warmup_epochs = warmup_epochs
+        self.check_every = check_every
+        self.min_trials = min_trials
+        self.pruned = False
+        self.last_loss = float('nan')
+
+    def __call__(self, epoch: int, loss: float) -> bool:
+        self.last_loss = loss
+        if epoch < self.warmup_epochs or epoch % self.check_every != 0:
+            return False
+        self.losses[(self.trial, epoch)] = loss
+        others = [value for (trial, trial_epoch), value in self.losses.items()
+                  if trial_epoch == epoch and trial != self.trial]
+        if len(others) >= self.min_trials and loss > statistics.median(others):
+            self.pruned = True
+        return self.pruned
+
+def run_trial(trial: int, config: dict, losses, log_dir, pruning: dict) -> dict:
+    import torch
+    from SimpleNeuronChain import ClassifierModel, Net, XORDataCreator
+
+    config = {**default_config, **config}
+    torch.manual_seed(config['seed'])
+    model = ClassifierModel(inputs_number=2, hidden_layer_neurons_number=config['hidden_layer_neurons_number'],
+                            outputs_number=1)
+    training_data = XORDataCreator(config['data_size'], config['noise_std_deviation'], seed=config['seed'])
+    net_model = Net(data_seed=config['seed'], dataset=training_data)
+    net_model.set_logging(os.path.join(log_dir, f'trial_{trial}'), log_every_steps=50, log_every_seconds=30.0)
+    pruner = MedianPruner(losses, trial, **pruning)
+
+    start = time.perf_counter()
+    net_model.train_and_log(model, epochs_num=config['epochs_num'], batch_size=config['batch_size'], lr=config['lr'],
+                            epoch_callback=pruner)
+    seconds = time.perf_counter() - start
+
+    # Poprawność na nowych danych (inne ziarno niż dane treningowe)
+    validation = XORDataCreator(2000, config['noise_std_deviation'], seed=config['seed'] + 1000003)
+    model.to('cpu').eval()
+    with torch.inference_mode():
+        predicted = model(validation.data_inputs).squeeze(dim=1) > 0
+    accuracy = (predicted == validation.data_labels.bool()).float().mean().item()
+    return dict(trial=trial, **config, status='pruned' if pruner.pruned else 'complete', loss=pruner.last_loss,
+                accuracy=accuracy, seconds=seconds)
+
+# Uruchomienie prób w puli procesów - po jednym procesie na workers prób jednocześnie, każdy z threads wątkami
+def run_sweep(configs: list, workers: int=None, threads: int=None, log_dir='logs/sweep', pruning: dict=None) -> list:
+    workers = workers or max(1, min(len(configs), os.cpu_count() or 1))
+    threads = threads or max(1, (os.cpu_count() or 1) // workers)
+    context = multiprocessing.get_context('spawn')
+    results = list()
+    with context.Manager() as manager:
+        losses = manager.dict()
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=init_trial_worker,
+                                 initargs=(threads,)) as executor:
+            futures = [executor.submit(run_trial, trial, config, losses, log_dir, pruning or dict())
+                       for trial, config in enumerate(configs)]
+            for future in as_completed(futures):
+                result = future.result()
+                print(f"próba {result['trial']}: {result['status']}, poprawność {result['accuracy']:.3f}, "
+                      f"{result['seconds']:.1f} s")
+                results.append(result)
+    # Ranking: najpierw ukończone próby (przerwana próba mogła mieć przypadkowo dobry wynik pośredni),
+    # potem poprawność, przy równej poprawności krótszy trening
+    results.sort(key=lambda result: (result['status'] == 'pruned', -result['accuracy'], result['seconds']))
+    return results
+
+def save_results(results: list, output_file) -> None:
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['rank', *results[0]])
+        writer.writeheader()
+        for rank, result in enumerate(results, start=1):
+            writer.writerow(dict(rank=rank, **result))
+
+def print_results(results: list, space: dict) -> None:
+    names = list(space)
+    print(f'{"miejsce":>8}{"próba":>7}' + ''.join(f'{name[:14]:>16}' for name in names)
+          + f'{"status":>10}{"błąd":>10}{"poprawność":>12}{"czas [s]":>10}')
+    for rank, result in enumerate(results, start=1):
+        values = ''.join(f'{result[name]:>16.4g}' if isinstance(result[name], float) else f'{result[name]:>16}'
+                         for name in names)
+        print(f'{rank:>8}{result["trial"]:>7}{values}{result["status"]:>10}{result["loss"]:>10.4f}'
+              f'{result["accuracy"]:>12.3f}{result["seconds"]:>10.1f}')
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Przeszukiwanie hiperparametrów klasyfikatora XOR")
+    parser.add_argument("--search", choices=["grid", "random"], default="grid")
+    parser.add_argument("--space", type=parse_space, default=default_space,
+                        help='przestrzeń w JSON, np. {"lr": {"low": 0.001, "high": 1}, "batch_size": [16, 32]}')
+    parser.add_argument("--trials", type=int, default=20, help="liczba prób przeszukiwania losowego")
+    parser.add_argument("--seed", type=int, default=None, help="ziarno przeszukiwania losowego")
+    parser.add_argument("--epochs", type=int, default=150)
+    parser.add_argument("--workers", type=int, default=None, help="liczba prób uruchamianych jednocześnie")
+    parser.add_argument("--threads", type=int, default=None, help="liczba wątków PyTorch na próbę")
+    parser.add_argument("--warmup-epochs", type=int, default=20, help="od której epoki można przerwać próbę")
+    parser.add_argument("--no-pruning", action="store_true", help="nie przerywaj słabych prób")
+    parser.add_argument("--log-dir", default="logs/sweep")
+    parser.add_argument("--output", default="sweep_results.csv")
+    args = parser.parse_args()
+
+    if args.search == "grid":
+        configs = grid_search(args.space)
+    else:
+        configs = random_search(args.space, args.trials, args.seed)
+    for config in configs:
+        config.setdefault('epochs_num', args.epochs)
+
+    # Bez przerywania - pruner nigdy nie kończy rozgrzewki (przestrzeń może też zmieniać epochs_num)
+    pruning = dict(warmup_epochs=math.inf if args.no_pruning else args.warmup_epochs)
+    start = time.perf_counter()
+    results = run_sweep(configs, args.workers, args.threads, args.log_dir, pruning)
+    print(f"{len(results)} prób w {time.perf_counter() - start:.1f} s")
+    print_results(results, args.space)
+    save_results(results, args.output)
+    print("Results saved to ", args.output)
@@ -0,0 +1,147 @@
+"""
+Persistent response cache for LLM calls, shared by the run-*.py scripts.
+
+A response is stored under the SHA-256 hash of the full request (engine, model, messages,
+temperature, max_tokens, ...), so repeating an identical request returns the stored response
+instead of calling the provider again. Entries live in a local SQLite database and are evicted
+when they are older than the TTL or when the database grows over its size limit (least recently
+used first). Lookups only read - the access times of hits are kept in memory and written together
+with the next stored response (or on evict / close), so a hit never waits for a commit. Use the cache
+as a context manager (`with LLMCache() as cache:`), so the access times are written also when the
+script only had hits.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+CACHE_CONFIG = {
+    "path": os.getenv("LLM_CACHE_FILE", ".llm_cache.sqlite"),
+    "max_size_mb": 256,
+    "ttl_seconds": 7 * 24 * 3600,  # one week
+    "evict_every": 100,  # size check after every N stored responses
+}
+
+
+def request_key(request):
+    """Hash of the canonical JSON form of the request - the same request always gives the same key."""
+    canonical = json.dumps(request, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """SQLite backed response cache, safe to share between threads and asyncio tasks of one process
+    and between processes using the same file."""
+
+    def __init__(self, path=None, max_size_mb=None, ttl_seconds=None):
+        self.path = path or CACHE_CONFIG["path"]
+        self.max_size_bytes = int((max_size_mb or CACHE_CONFIG["max_size_mb"]) * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else CACHE_CONFIG["ttl_seconds"]
+
+        self.hits = 0
+        self.misses = 0
+        self.saved_seconds = 0.0
+        self.stored = 0
+        # key -> last access time of hits not written to the database yet
+        self.touched = {}
+
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " latency REAL NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.connection.execute("CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)")
+        self.connection.commit()
+        self.evict()
+
+    def get(self, request):
+        """Stored response for the request, or None. A hit adds the original call latency to saved_seconds."""
+        key = request_key(request)
+        now = time.time()
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT response, latency, created FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            # Expired entries are deleted by evict()
+            if row is None or now - row[2] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self.touched[key] = now
+            self.hits += 1
+            self.saved_seconds += row[1]
+        return json.loads(row[0])
+
+    def put(self, request, response, latency):
+        """Store a successful response (any JSON serializable value) with the latency of the real call."""
+        data = json.dumps(response, ensure_ascii=False)
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO responses (key, response, latency, size, created, last_access)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (request_key(request), data, latency, len(data.encode("utf-8")), now, now),
+            )
+            self._write_touched()
+            self.connection.commit()
+            self.stored += 1
+            evict = self.stored % CACHE_CONFIG["evict_every"] == 0
+        if evict:
+            self.evict()
+
+    def _write_touched(self):
+        """Write the buffered access times of hits (caller holds the lock and commits)."""
+        if self.touched:
+            self.connection.executemany("UPDATE responses SET last_access = ? WHERE key = ?",
+                                        [(accessed, key) for key, accessed in self.touched.items()])
+            self.touched.clear()
+
+    def evict(self):
+        """Drop expired entries, then the least recently used ones until the cache fits in max_size_mb."""
+        with self.lock:
+            self._write_touched()
+            self.connection.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl_seconds,))
+            total_size = self.connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+            if total_size > self.max_size_bytes:
+                excess = total_size - self.max_size_bytes
+                freed = 0
+                keys = []
+                for key, size in self.connection.execute("SELECT key, size FROM responses ORDER BY last_access"):
+                    keys.append((key,))
+                    freed += size
+                    if freed >= excess:
+                        break
+                self.connection.executemany("DELETE FROM responses WHERE key = ?", keys)
+            self.connection.commit()
+
+    def stats(self):
+        """Cache metrics of this process, ready for mlflow.log_metrics."""
+        lookups = self.hits + self.misses
+        return {
+            "cache_hits": self.hits,
+            "cache_misses": self.misses,
+            "cache_hit_rate": self.hits / lookups if lookups else 0.0,
+            "cache_saved_seconds": self.saved_seconds,
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Write the buffered access times of hits - without it LRU eviction does not see them."""
+        with self.lock:
+            self._write_touched()
+            self.connection.commit()
+            self.connection.close()
@@ -0,0 +1,302 @@
+"""
+Batched, non-blocking MLflow logging for the LLM scripts.
+
+MlflowSink collects params, metrics and tags in memory and sends them from a background thread
+with MlflowClient.log_batch - one HTTP request for up to 1000 values instead of one request per
+value. Text artifacts are written to a local staging directory and uploaded together when the
+sink is closed. When the tracking server is slow or down, records are appended to a local spool
+file (JSON lines) instead, so the script never waits for tracking. Replay them later with:
+
+    python3 mlflow_sink.py replay
+"""
+import argparse
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+
+SINK_CONFIG = {
+    "tracking_uri": "http://127.0.0.1:5000/",
+    "flush_interval": 2.0,  # seconds between batches
+    "spool_file": os.getenv("MLFLOW_SPOOL_FILE", ".mlflow_spool.jsonl"),
+    "offline_backoff": 30.0,  # seconds of spooling without contacting the server after a failure
+    # MLflow retries failed HTTP requests for minutes by default - a dead server should be detected quickly
+    # and the records spooled instead (MLFLOW_HTTP_REQUEST_* variables set by the user take precedence)
+    "request_timeout": 10,
+    "request_max_retries": 1,
+}
+
+# log_batch limits of the MLflow REST API
+MAX_METRICS_PER_BATCH = 1000
+MAX_PARAMS_PER_BATCH = 100
+MAX_TAGS_PER_BATCH = 100
+MAX_ENTITIES_PER_BATCH = 1000
+
+
+def _timestamp():
+    return int(time.time() * 1000)
+
+
+def _batches(records):
+    """Split records into groups that fit into one log_batch request."""
+    batch, counts = [], {"metric": 0, "param": 0, "tag": 0}
+    limits = {"metric": MAX_METRICS_PER_BATCH, "param": MAX_PARAMS_PER_BATCH, "tag": MAX_TAGS_PER_BATCH}
+    for record in records:
+        if counts[record["type"]] >= limits[record["type"]] or len(batch) >= MAX_ENTITIES_PER_BATCH:
+            yield batch
+            batch, counts = [], {"metric": 0, "param": 0, "tag": 0}
+        batch.append(record)
+        counts[record["type"]] += 1
+    if batch:
+        yield batch
+
+
+def _is_invalid_data(error):
+    """The server rejected the values themselves (e.g. a param logged twice with different values) -
+    sending them again would fail again, so they are dropped instead of spooled."""
+    return getattr(error, "error_code", None) == "INVALID_PARAMETER_VALUE"
+
+
+def send_records(client, run_id, records):
+    """Send metric / param / tag records of one run with as few log_batch calls as possible.
+    Batches rejected as invalid are dropped. Any other error stops sending and gets a `records_done`
+    attribute - the number of leading records already sent or dropped, only the rest has to be sent again."""
+    from mlflow.entities import Metric, Param, RunTag
+
+    done = 0
+    for batch in _batches(records):
+        try:
+            client.log_batch(
+                run_id,
+                metrics=[Metric(r["key"], r["value"], r["timestamp"], r["step"])
+                         for r in batch if r["type"] == "metric"],
+                params=[Param(r["key"], r["value"]) for r in batch if r["type"] == "param"],
+                tags=[RunTag(r["key"], r["value"]) for r in batch if r["type"] == "tag"],
+            )
+        except Exception as e:
+            if not _is_invalid_data(e):
+                e.records_done = done
+                raise
+            print(f"⚠️  MLflow rejected {len(batch)} records: {e}")
+        done += len(batch)
+    return done
+
+
+def _limit_http_retries():
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_TIMEOUT", str(SINK_CONFIG["request_timeout"]))
+    os.environ.setdefault("MLFLOW_HTTP_REQUEST_MAX_RETRIES", str(SINK_CONFIG["request_max_retries"]))
+
+
+class MlflowSink:
+    """Buffered logging to one MLflow run. All log_* methods only enqueue and return immediately,
+    they can be called from any thread or asyncio task."""
+
+    def __init__(self, run_id, tracking_uri=None, flush_interval=None, spool_file=None):
+        self.run_id = run_id
+        self.tracking_uri = tracking_uri or SINK_CONFIG["tracking_uri"]
+        self.flush_interval = flush_interval if flush_interval is not None else SINK_CONFIG["flush_interval"]
+        self.spool_file = spool_file or SINK_CONFIG["spool_file"]
+
+        self.client = None
+        self.offline_until = 0.0
+        self.sent = 0
+        self.spooled = 0
+        self.spool_lock = threading.Lock()
+        self.artifact_dir = tempfile.mkdtemp(prefix="mlflow_artifacts_")
+        self.artifacts = 0
+
+        self.queue = queue.Queue()
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, name="MlflowSink", daemon=True)
+        self.thread.start()
+
+    # --- Logging API (mirrors mlflow.log_*) ---
+
+    def log_param(self, key, value):
+        self.queue.put({"type": "param", "key": key, "value": str(value)})
+
+    def log_params(self, params):
+        for key, value in params.items():
+            self.log_param(key, value)
+
+    def log_metric(self, key, value, step=0):
+        self.queue.put({"type": "metric", "key": key, "value": float(value), "timestamp": _timestamp(), "step": step})
+
+    def log_metrics(self, metrics, step=0):
+        for key, value in metrics.items():
+            self.log_metric(key, value, step)
+
+    def set_tag(self, key, value):
+        self.queue.put({"type": "tag", "key": key, "value": str(value)})
+
+    def log_text(self, text, artifact_file):
+        """Written to the local staging directory now, uploaded with all other artifacts on close()."""
+        path = os.path.join(self.artifact_dir, artifact_file)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.artifacts += 1
+
+    def log_artifact(self, local_path, artifact_path=None):
+        target_dir = os.path.join(self.artifact_dir, artifact_path) if artifact_path else self.artifact_dir
+        os.makedirs(target_dir, exist_ok=True)
+        shutil.copy2(local_path, target_dir)
+        self.artifacts += 1
+
+    # --- Background thread ---
+
+    def run(self):
+        stopped = False
+        while not stopped:
+            records, stopped = self._collect()
+            try:
+                if records:
+                    self._send(records)
+            except Exception as e:
+                # Even the spool file failed - the records are lost, but the thread has to keep running,
+                # otherwise flush() and close() would wait forever
+                print(f"❌ {len(records)} MLflow records lost: {e}")
+            finally:
+                for _ in range(len(records) + stopped):
+                    self.queue.task_done()
+
+    def _collect(self):
+        """Wait up to flush_interval, then take everything that is queued. None in the queue means close()."""
+        records = []
+        deadline = time.monotonic() + self.flush_interval
+        while True:
+            timeout = deadline - time.monotonic()
+            try:
+                record = self.queue.get(timeout=timeout) if timeout > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                return records, False
+            if record is None:
+                return records, True
+            records.append(record)
+
+    def _get_client(self):
+        if self.client is None:
+            _limit_http_retries()
+            from mlflow.tracking import MlflowClient
+            self.client = MlflowClient(tracking_uri=self.tracking_uri)
+        return self.client
+
+    def _send(self, records):
+        if time.monotonic() < self.offline_until:
+            self._spool(records)
+            return
+        try:
+            self.sent += send_records(self._get_client(), self.run_id, records)
+        except Exception as e:
+            # Batches accepted before the failure are not spooled, so the replay does not log them twice
+            done = getattr(e, "records_done", 0)
+            self.sent += done
+            print(f"⚠️  MLflow tracking server unavailable ({e}), spooling to {self.spool_file}")
+            self.offline_until = time.monotonic() + SINK_CONFIG["offline_backoff"]
+            self._spool(records[done:])
+
+    def _spool(self, records, artifact_dir=None):
+        with self.spool_lock, open(self.spool_file, "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps({"run_id": self.run_id, **record}) + "\n")
+            if artifact_dir is not None:
+                f.write(json.dumps({"run_id": self.run_id, "type": "artifacts", "path": artifact_dir}) + "\n")
+        self.spooled += len(records)
+
+    def _upload_artifacts(self):
+        if not self.artifacts:
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
+            return
+        try:
+            if time.monotonic() < self.offline_until:
+                raise ConnectionError("tracking server marked offline")
+            self._get_client().log_artifacts(self.run_id, self.artifact_dir)
+            shutil.rmtree(self.artifact_dir, ignore_errors=True)
+        except Exception as e:
+            print(f"⚠️  Artifact upload failed ({e}), kept in {self.artifact_dir} for replay")
+            try:
+                self._spool([], artifact_dir=self.artifact_dir)
+            except OSError as spool_error:
+                print(f"❌ Could not spool the artifacts: {spool_error}")
+
+    def flush(self):
+        """Block until everything logged so far has been sent or spooled."""
+        self.queue.join()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """Send the remaining records and upload the artifacts in one call."""
+        if self.closed:
+            return
+        self.closed = True
+        self.queue.put(None)
+        self.thread.join()
+        self._upload_artifacts()
+
+
+def replay_spool(spool_file=None, tracking_uri=None):
+    """Send spooled records to the tracking server. Records that still fail stay in the spool file."""
+    _limit_http_retries()
+    from mlflow.tracking import MlflowClient
+
+    spool_file = spool_file or SINK_CONFIG["spool_file"]
+    if not os.path.exists(spool_file):
+        print(f"Nothing to replay, {spool_file} does not exist")
+        return 0
+    # Move the spool aside first, so sinks running at the same time keep appending to a new file
+    replay_file = spool_file + ".replay"
+    os.replace(spool_file, replay_file)
+    with open(replay_file, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f if line.strip()]
+
+    client = MlflowClient(tracking_uri=tracking_uri or SINK_CONFIG["tracking_uri"])
+    runs = {}
+    for record in records:
+        runs.setdefault(record.pop("run_id"), []).append(record)
+
+    failed, replayed = [], 0
+    for run_id, run_records in runs.items():
+        values = [r for r in run_records if r["type"] != "artifacts"]
+        try:
+            replayed += send_records(client, run_id, values)
+        except Exception as e:
+            print(f"❌ Run {run_id}: {e}")
+            done = getattr(e, "records_done", 0)
+            replayed += done
+            failed.extend({"run_id": run_id, **r} for r in values[done:])
+        for record in run_records:
+            if record["type"] != "artifacts":
+                continue
+            try:
+                client.log_artifacts(run_id, record["path"])
+                shutil.rmtree(record["path"], ignore_errors=True)
+            except Exception as e:
+                print(f"❌ Run {run_id} artifacts: {e}")
+                failed.append({"run_id": run_id, **record})
+
+    if failed:
+        with open(spool_file, "a", encoding="utf-8") as f:
+            for record in failed:
+                f.write(json.dumps(record) + "\n")
+    os.remove(replay_file)
+    print(f"✅ Replayed {replayed} records, {len(failed)} left in {spool_file}")
+    return replayed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MLflow logging spool")
+    commands = parser.add_subparsers(dest="command", required=True)
+    replay_parser = commands.add_parser("replay", help="send spooled records to the tracking server")
+    replay_parser.add_argument("--spool-file", default=SINK_CONFIG["spool_file"])
+    replay_parser.add_argument("--tracking-uri", default=SINK_CONFIG["tracking_uri"])
+    args = parser.parse_args()
+
+    replay_spool(args.spool_file, args.tracking_uri)
@@ -0,0 +1,38 @@
+"""
+LLM providers used by the run-*.py scripts.
+
+get_provider(name) returns one shared provider per name in the process. Provider modules, and the
+heavy openai / google.genai packages they use, are imported only when the provider is first
+requested. Adding a provider means adding one module with a Provider subclass and registering it
+in PROVIDER_MODULES.
+"""
+import importlib
+import threading
+
+from providers.base import POOL_CONFIG, CompletionResult, Provider
+
+# Provider name -> (module, class name)
+PROVIDER_MODULES = {
+    "openai": ("providers.openai_provider", "OpenAIProvider"),
+    "gemini": ("providers.gemini_provider", "GeminiProvider"),
+    "ollama": ("providers.local_provider", "OllamaProvider"),
+    "llama-cpp": ("providers.local_provider", "LlamaCppProvider"),
+}
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    with _providers_lock:
+        provider = _providers.get(name)
+        if provider is None:
+            if name not in PROVIDER_MODULES:
+                raise ValueError(f"Unknown provider '{name}', available: {', '.join(sorted(PROVIDER_MODULES))}")
+            module_name, class_name = PROVIDER_MODULES[name]
+            provider = getattr(importlib.import_module(module_name), class_name)()
+            _providers[name] = provider
+        return provider
+
+
+__all__ = ["POOL_CONFIG", "PROVIDER_MODULES", "CompletionResult", "Provider", "get_provider"]
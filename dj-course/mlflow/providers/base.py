@@ -0,0 +1,192 @@
+"""
+Common part of all providers: the result object, lazily created shared clients and the call
+path (response cache -> rate limiter -> model call with retries) used by every script.
+"""
+import asyncio
+import threading
+import time
+from dataclasses import asdict, dataclass
+
+from rate_limiter import call_with_retries, call_with_retries_async, estimate_tokens, get_limiter
+
+# HTTP connection pool of every client - connections are kept alive between calls,
+# so only the first call to a provider pays for the TCP / TLS handshake
+POOL_CONFIG = {
+    "max_connections": 64,
+    "max_keepalive_connections": 32,
+    "keepalive_expiry": 60.0,  # seconds
+    "timeout": 120.0,  # seconds
+}
+
+
+def http_limits():
+    """httpx connection pool limits from POOL_CONFIG (httpx is imported only when a client is created)."""
+    import httpx
+    return httpx.Limits(max_connections=POOL_CONFIG["max_connections"],
+                        max_keepalive_connections=POOL_CONFIG["max_keepalive_connections"],
+                        keepalive_expiry=POOL_CONFIG["keepalive_expiry"])
+
+
+@dataclass
+class CompletionResult:
+    text: str
+    engine: str
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency: float = 0.0  # seconds, successful model call only
+    wait_seconds: float = 0.0  # rate limiter queueing, failed attempts and backoff before it
+    attempts: int = 1
+    cached: bool = False
+
+    def to_dict(self):
+        return asdict(self)
+
+
+class Provider:
+    """Base class of a provider module. A subclass sets `engine` and `config` and implements
+    create_client / create_async_client / call / call_async. Clients are created on first use
+    and shared by all threads (sync client) or all tasks of the event loop (async client)."""
+
+    engine = None
+    config = {}
+
+    def __init__(self, **overrides):
+        self.config = {**self.config, **overrides}
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    # --- Clients ---
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self.create_client()
+        return self._client
+
+    @property
+    def async_client(self):
+        if self._async_client is None:
+            with self._lock:
+                if self._async_client is None:
+                    self._async_client = self.create_async_client()
+        return self._async_client
+
+    def create_client(self):
+        raise NotImplementedError
+
+    def create_async_client(self):
+        raise NotImplementedError
+
+    # --- Model calls, return (text, prompt_tokens, completion_tokens, total_tokens) ---
+
+    def call(self, request):
+        raise NotImplementedError
+
+    async def call_async(self, request):
+        raise NotImplementedError
+
+    # --- Common call path ---
+
+    def request(self, prompt, system=None, temperature=None, max_tokens=None, model=None):
+        """Provider independent description of a call - also the response cache key."""
+        messages = [{"role": "user", "content": prompt}]
+        if system is not None:
+            messages.insert(0, {"role": "system", "content": system})
+        return {
+            "engine": self.engine,
+            "model": model or self.config["model"],
+            "messages": messages,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+        }
+
+    def _prepare(self, request, cache):
+        cached = cache.get(request) if cache is not None else None
+        if cached is not None:
+            return CompletionResult(text=cached["response"], engine=self.engine, model=request["model"],
+                                    prompt_tokens=cached.get("prompt_tokens", 0),
+                                    completion_tokens=cached.get("completion_tokens", 0),
+                                    total_tokens=cached.get("total_tokens", 0), attempts=0, cached=True), None, 0
+        limiter = get_limiter(self.engine, request["model"])
+        texts = [message["content"] for message in request["messages"]]
+        return None, limiter, estimate_tokens(texts, request["max_tokens"])
+
+    def _finish(self, request, response, start, latency, retries, limiter, estimated_tokens, cache):
+        text, prompt_tokens, completion_tokens, total_tokens = response
+        result = CompletionResult(text=text, engine=self.engine, model=request["model"],
+                                  prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                  total_tokens=total_tokens, latency=latency,
+                                  wait_seconds=time.perf_counter() - start - latency, attempts=len(retries) + 1)
+        if limiter is not None:
+            limiter.record_usage(estimated_tokens, total_tokens)
+        if cache is not None:
+            cache.put(request, {"response": text, "prompt_tokens": prompt_tokens,
+                                "completion_tokens": completion_tokens, "total_tokens": total_tokens}, result.latency)
+        return result
+
+    def complete(self, prompt, system=None, temperature=None, max_tokens=None, model=None, cache=None, on_retry=None):
+        """Answer from the cache, or call the model within its rate limit, retrying transient errors.
+        on_retry(attempt, error, delay) is called before each retry."""
+        request = self.request(prompt, system, temperature, max_tokens, model)
+        result, limiter, estimated_tokens = self._prepare(request, cache)
+        if result is not None:
+            return result
+        retries = []
+
+        def report_retry(attempt, error, delay):
+            retries.append(attempt)
+            if on_retry is not None:
+                on_retry(attempt, error, delay)
+
+        # Only the successful attempt is the latency of the model - waiting for the limiter and backoff is not
+        timing = {}
+
+        def attempt():
+            attempt_start = time.perf_counter()
+            response = self.call(request)
+            timing["latency"] = time.perf_counter() - attempt_start
+            return response
+
+        start = time.perf_counter()
+        response = call_with_retries(attempt, limiter=limiter, tokens=estimated_tokens,
+                                     max_retries=self.config.get("max_retries"), on_retry=report_retry)
+        return self._finish(request, response, start, timing["latency"], retries, limiter, estimated_tokens, cache)
+
+    async def complete_async(self, prompt, system=None, temperature=None, max_tokens=None, model=None, cache=None,
+                             on_retry=None):
+        """complete for asyncio - uses the async client, many calls can be in flight at once.
+        The cache (blocking sqlite3 calls) is used from a worker thread, so it never stalls the event loop."""
+        request = self.request(prompt, system, temperature, max_tokens, model)
+        if cache is not None:
+            result, limiter, estimated_tokens = await asyncio.to_thread(self._prepare, request, cache)
+        else:
+            result, limiter, estimated_tokens = self._prepare(request, cache)
+        if result is not None:
+            return result
+        retries = []
+
+        def report_retry(attempt, error, delay):
+            retries.append(attempt)
+            if on_retry is not None:
+                on_retry(attempt, error, delay)
+
+        timing = {}
+
+        async def attempt():
+            attempt_start = time.perf_counter()
+            response = await self.call_async(request)
+            timing["latency"] = time.perf_counter() - attempt_start
+            return response
+
+        start = time.perf_counter()
+        response = await call_with_retries_async(attempt, limiter=limiter, tokens=estimated_tokens,
+                                                 max_retries=self.config.get("max_retries"), on_retry=report_retry)
+        if cache is not None:
+            return await asyncio.to_thread(self._finish, request, response, start, timing["latency"], retries,
+                                           limiter, estimated_tokens, cache)
+        return self._finish(request, response, start, timing["latency"], retries, limiter, estimated_tokens, cache)
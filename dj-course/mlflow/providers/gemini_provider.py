@@ -0,0 +1,69 @@
+"""Google Gemini through the google.genai package."""
+import os
+
+from providers.base import POOL_CONFIG, Provider, http_limits
+
+GEMINI_CONFIG = {
+    "engine": "gemini",
+    "model": "gemini-2.0-flash-lite",  # Lightweight model with better free tier quotas
+    "api_key_env": "GOOGLE_API_KEY",
+    "max_retries": 3,
+}
+
+
+class GeminiProvider(Provider):
+    engine = "gemini"
+    config = GEMINI_CONFIG
+
+    def create_client(self):
+        import google.genai as genai
+        from google.genai import types
+
+        api_key = os.getenv(self.config["api_key_env"])
+        if not api_key:
+            raise ValueError(
+                f"{self.config['api_key_env']} not found in .env file. "
+                f"Add it to .env with: {self.config['api_key_env']}='your-api-key-here'"
+            )
+        timeout = int(POOL_CONFIG["timeout"] * 1000)  # milliseconds
+        try:
+            limits = http_limits()
+            http_options = types.HttpOptions(timeout=timeout, client_args={"limits": limits},
+                                             async_client_args={"limits": limits})
+        except Exception:
+            # Older google-genai versions do not accept httpx client arguments - keep their default pool
+            http_options = types.HttpOptions(timeout=timeout)
+        return genai.Client(api_key=api_key, http_options=http_options)
+
+    # The async client of google.genai is a view of the same client (client.aio)
+    def create_async_client(self):
+        return self.client.aio
+
+    @staticmethod
+    def arguments(request):
+        from google.genai import types
+
+        system = [message["content"] for message in request["messages"] if message["role"] == "system"]
+        contents = "\n\n".join(message["content"] for message in request["messages"] if message["role"] != "system")
+        arguments = {"model": request["model"], "contents": contents}
+        if system or request["temperature"] is not None or request["max_tokens"] is not None:
+            arguments["config"] = types.GenerateContentConfig(
+                system_instruction="\n\n".join(system) or None,
+                temperature=request["temperature"],
+                max_output_tokens=request["max_tokens"],
+            )
+        return arguments
+
+    @staticmethod
+    def parse(response):
+        usage = response.usage_metadata
+        return (response.text,
+                getattr(usage, "prompt_token_count", None) or 0,
+                getattr(usage, "candidates_token_count", None) or 0,
+                getattr(usage, "total_token_count", None) or 0)
+
+    def call(self, request):
+        return self.parse(self.client.models.generate_content(**self.arguments(request)))
+
+    async def call_async(self, request):
+        return self.parse(await self.async_client.models.generate_content(**self.arguments(request)))
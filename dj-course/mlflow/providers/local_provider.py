@@ -0,0 +1,38 @@
+"""Local llama.cpp / Ollama servers with an OpenAI compatible API."""
+from providers.openai_provider import OpenAIProvider
+
+# An API key is not strictly needed, but the client requires a Base URL to be passed
+LLAMA_CPP_SERVER = {
+    "engine": "llama-cpp",
+    "model": "whatever-model", # 🔥🔥🔥 tu nie ma różnicy co wpiszesz, bo na tym URLu jest tylko 1 model
+    "base_url": "http://localhost:8080/v1",
+    "max_retries": 3,
+}
+OLLAMA_SERVER = {
+    "engine": "ollama",
+    "model": "mistral", # 🔥🔥🔥 tu JEST różnica, bo ollama ma wiele modeli, a llama-cpp ma tylko 1 model
+    "base_url": "http://localhost:11434/v1",
+    "max_retries": 3,
+}
+
+
+class LocalServerProvider(OpenAIProvider):
+
+    def client_options(self):
+        return {"base_url": self.config["base_url"], "api_key": "sk-not-needed"}
+
+    # Different servers may serve different models under the same name
+    def request(self, prompt, system=None, temperature=None, max_tokens=None, model=None):
+        request = super().request(prompt, system, temperature, max_tokens, model)
+        request["base_url"] = self.config["base_url"]
+        return request
+
+
+class LlamaCppProvider(LocalServerProvider):
+    engine = "llama-cpp"
+    config = LLAMA_CPP_SERVER
+
+
+class OllamaProvider(LocalServerProvider):
+    engine = "ollama"
+    config = OLLAMA_SERVER
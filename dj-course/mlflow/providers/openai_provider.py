@@ -0,0 +1,59 @@
+"""OpenAI chat completions (also the base of the OpenAI compatible local servers)."""
+import os
+
+from providers.base import POOL_CONFIG, Provider, http_limits
+
+OPENAI_CONFIG = {
+    "engine": "openai",
+    "model": "gpt-3.5-turbo",  # Or use "gpt-4", "gpt-4-turbo", etc.
+    "api_key_env": "OPENAI_API_KEY",
+    "max_retries": 3,
+}
+
+
+class OpenAIProvider(Provider):
+    engine = "openai"
+    config = OPENAI_CONFIG
+
+    def client_options(self):
+        api_key = os.getenv(self.config["api_key_env"])
+        if not api_key:
+            raise ValueError(
+                f"{self.config['api_key_env']} not found in .env file. "
+                f"Add it to .env with: {self.config['api_key_env']}='your-api-key-here'"
+            )
+        return {"api_key": api_key}
+
+    # Retries are handled by rate_limiter (shared budget, Retry-After), so the SDK does not retry on its own
+    def create_client(self):
+        import openai
+        return openai.OpenAI(**self.client_options(), timeout=POOL_CONFIG["timeout"], max_retries=0,
+                             http_client=openai.DefaultHttpxClient(limits=http_limits()))
+
+    def create_async_client(self):
+        import openai
+        return openai.AsyncOpenAI(**self.client_options(), timeout=POOL_CONFIG["timeout"], max_retries=0,
+                                  http_client=openai.DefaultAsyncHttpxClient(limits=http_limits()))
+
+    @staticmethod
+    def arguments(request):
+        arguments = {"model": request["model"], "messages": request["messages"]}
+        if request["temperature"] is not None:
+            arguments["temperature"] = request["temperature"]
+        if request["max_tokens"] is not None:
+            arguments["max_tokens"] = request["max_tokens"]
+        return arguments
+
+    @staticmethod
+    def parse(response):
+        usage = response.usage
+        return (response.choices[0].message.content,
+                usage.prompt_tokens if usage else 0,
+                usage.completion_tokens if usage else 0,
+                usage.total_tokens if usage else 0)
+
+    def call(self, request):
+        return self.parse(self.client.chat.completions.create(**self.arguments(request)))
+
+    async def call_async(self, request):
+        return self.parse(await self.async_client.chat.completions.create(**self.arguments(request)))
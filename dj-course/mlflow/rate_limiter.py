@@ -0,0 +1,257 @@
+"""
+Shared rate limiting and retry logic for the LLM scripts.
+
+RateLimiter paces requests before they are sent: one token bucket for requests per minute and
+one for tokens per minute. Callers reserve capacity and then sleep outside the lock, so the same
+limiter can be shared by threads (acquire) and asyncio tasks (acquire_async) without blocking
+each other. When the provider still answers 429, penalize() pauses every caller of that model
+for the Retry-After time. call_with_retries / call_with_retries_async retry rate limits and
+transient errors with jittered exponential backoff.
+"""
+import asyncio
+import email.utils
+import random
+import re
+import threading
+import time
+
+# Budgets per (engine, model). Fill in the limits of your account tier - these are conservative defaults
+RATE_LIMITS = {
+    ("openai", "gpt-3.5-turbo"): {"requests_per_minute": 500, "tokens_per_minute": 60000},
+    ("openai", "gpt-4"): {"requests_per_minute": 500, "tokens_per_minute": 10000},
+    ("gemini", "gemini-2.0-flash-lite"): {"requests_per_minute": 30, "tokens_per_minute": 1000000},
+}
+DEFAULT_LIMITS = {"requests_per_minute": 60, "tokens_per_minute": 100000}
+# Local servers are not rate limited
+UNLIMITED_ENGINES = {"ollama", "llama-cpp"}
+
+RETRY_CONFIG = {
+    "max_retries": 5,
+    "base_delay": 1.0,  # seconds, doubled on every retry
+    "max_delay": 60.0,  # seconds
+    # Largest burst allowed after an idle period, in seconds of budget. Providers also enforce their per-minute
+    # limits over shorter windows, so sending a whole minute of budget at once would be rejected
+    "burst_seconds": 1.0,
+}
+
+
+class TokenBucket:
+    """Bucket refilled at `per_minute / 60` units per second, holding at most `burst_seconds` of budget.
+
+    reserve() takes the units immediately, even when the bucket goes below zero, and returns
+    how long the caller has to wait until the units are really available. Every later caller
+    waits for the debt of earlier ones, so concurrent callers are spread out instead of all
+    waking up at the same time."""
+
+    def __init__(self, per_minute, burst_seconds=None):
+        self.rate = per_minute / 60.0
+        self.capacity = max(1.0, self.rate * (burst_seconds or RETRY_CONFIG["burst_seconds"]))
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, amount, now):
+        self.refill(now)
+        self.level -= amount
+        return 0.0 if self.level >= 0 else -self.level / self.rate
+
+    def adjust(self, amount):
+        self.level -= amount
+
+
+class RateLimiter:
+    """Requests/min and tokens/min budget of one model, safe to share between threads and asyncio tasks."""
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None):
+        self.requests = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.tokens = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.blocked_until = 0.0
+        # Held only while computing the reservation, never while sleeping
+        self.lock = threading.Lock()
+
+    def reserve(self, tokens=0):
+        """Reserve one request and `tokens` tokens, return the number of seconds to wait before sending."""
+        with self.lock:
+            now = time.monotonic()
+            delay = self.blocked_until - now
+            if self.requests is not None:
+                delay = max(delay, self.requests.reserve(1, now))
+            if self.tokens is not None and tokens:
+                delay = max(delay, self.tokens.reserve(tokens, now))
+            return max(delay, 0.0)
+
+    def acquire(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            time.sleep(delay)
+
+    async def acquire_async(self, tokens=0):
+        delay = self.reserve(tokens)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def record_usage(self, estimated_tokens, used_tokens):
+        """Correct the token budget once the real usage of a request is known."""
+        if self.tokens is not None and used_tokens:
+            with self.lock:
+                self.tokens.adjust(used_tokens - estimated_tokens)
+
+    def penalize(self, delay):
+        """The provider rejected a request - nobody sends to this model for the next `delay` seconds."""
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(engine, model):
+    """One shared limiter per (engine, model) in the process, or None for local servers."""
+    if engine in UNLIMITED_ENGINES:
+        return None
+    with _limiters_lock:
+        limiter = _limiters.get((engine, model))
+        if limiter is None:
+            limiter = RateLimiter(**RATE_LIMITS.get((engine, model), DEFAULT_LIMITS))
+            _limiters[(engine, model)] = limiter
+        return limiter
+
+
+def estimate_tokens(texts, max_tokens=0):
+    """Rough token count of a request (about 4 characters per token) plus the completion budget."""
+    return sum(len(text) for text in texts) // 4 + (max_tokens or 0)
+
+
+# --- Error classification ---
+
+def error_status(error):
+    """HTTP status code of an openai / google.genai error, if there is one."""
+    for attribute in ("status_code", "code", "status"):
+        value = getattr(error, attribute, None)
+        if isinstance(value, int):
+            return value
+    response = getattr(error, "response", None)
+    return getattr(response, "status_code", None)
+
+
+RATE_LIMIT_ERROR_TYPES = {"RateLimitError", "ResourceExhausted", "TooManyRequests"}
+# APITimeoutError is a subclass of APIConnectionError in the openai SDK
+CONNECTION_ERROR_TYPES = {"APIConnectionError", "ConnectError", "TimeoutException"}
+
+
+def _is_error_type(error, names):
+    """The error is an instance of a class with one of the names (subclasses included), checked by name so
+    the SDKs do not have to be imported."""
+    return any(cls.__name__ in names for cls in type(error).__mro__)
+
+
+def is_connection_error(error):
+    return _is_error_type(error, CONNECTION_ERROR_TYPES)
+
+
+def is_rate_limit_error(error):
+    """429 by status code or exception type. google.genai errors also carry the status name,
+    their message is checked only when they come without any code."""
+    if _is_error_type(error, RATE_LIMIT_ERROR_TYPES) or error_status(error) == 429:
+        return True
+    if getattr(error, "status", None) == "RESOURCE_EXHAUSTED":
+        return True
+    if type(error).__module__.startswith("google.genai") and error_status(error) is None:
+        return "RESOURCE_EXHAUSTED" in str(error)
+    return False
+
+
+def is_retryable_error(error):
+    """Rate limits, connection problems and server side (5xx) errors are worth retrying."""
+    if is_rate_limit_error(error):
+        return True
+    if is_connection_error(error) or _is_error_type(error, {"InternalServerError"}):
+        return True
+    status = error_status(error)
+    return status is not None and status >= 500
+
+
+def retry_after_seconds(error):
+    """Delay requested by the provider: Retry-After / retry-after-ms headers (OpenAI)
+    or the retryDelay of a RESOURCE_EXHAUSTED error (Gemini)."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        if headers.get("retry-after-ms"):
+            return float(headers["retry-after-ms"]) / 1000.0
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                retry_date = email.utils.parsedate_to_datetime(retry_after)
+                return max(0.0, retry_date.timestamp() - time.time())
+    except (TypeError, ValueError):
+        pass
+    match = re.search(r"retryDelay['\"]?\s*[:=]\s*['\"]?(\d+(?:\.\d+)?)s", str(error))
+    if match:
+        return float(match.group(1))
+    return None
+
+
+def backoff_delay(attempt, retry_after=None, base_delay=None, max_delay=None):
+    """Full-jitter exponential backoff: random delay up to base * 2^attempt (capped at max_delay).
+    A Retry-After from the provider is the lower bound."""
+    base_delay = base_delay if base_delay is not None else RETRY_CONFIG["base_delay"]
+    max_delay = max_delay if max_delay is not None else RETRY_CONFIG["max_delay"]
+    delay = random.uniform(0, min(max_delay, base_delay * 2 ** attempt))
+    if retry_after is not None:
+        delay = retry_after + random.uniform(0, base_delay)
+    return delay
+
+
+# --- Retry loops ---
+
+def _retry_delay(error, attempt, max_retries, limiter):
+    """Delay before the next attempt, or None when the error should be raised."""
+    if attempt >= max_retries - 1 or not is_retryable_error(error):
+        return None
+    retry_after = retry_after_seconds(error)
+    delay = backoff_delay(attempt, retry_after)
+    if limiter is not None and is_rate_limit_error(error):
+        limiter.penalize(delay)
+    return delay
+
+
+def call_with_retries(function, limiter=None, tokens=0, max_retries=None, on_retry=None):
+    """Call function() within the limiter budget, retrying retryable errors.
+    on_retry(attempt, error, delay) is called before each retry (attempt counted from 1)."""
+    max_retries = max_retries or RETRY_CONFIG["max_retries"]
+    for attempt in range(max_retries):
+        if limiter is not None:
+            limiter.acquire(tokens)
+        try:
+            return function()
+        except Exception as e:
+            delay = _retry_delay(e, attempt, max_retries, limiter)
+            if delay is None:
+                raise
+            if on_retry is not None:
+                on_retry(attempt + 1, e, delay)
+            time.sleep(delay)
+
+
+async def call_with_retries_async(function, limiter=None, tokens=0, max_retries=None, on_retry=None):
+    """call_with_retries for coroutines - function() returns an awaitable."""
+    max_retries = max_retries or RETRY_CONFIG["max_retries"]
+    for attempt in range(max_retries):
+        if limiter is not None:
+            await limiter.acquire_async(tokens)
+        try:
+            return await function()
+        except Exception as e:
+            delay = _retry_delay(e, attempt, max_retries, limiter)
+            if delay is None:
+                raise
+            if on_retry is not None:
+                on_retry(attempt + 1, e, delay)
+            await asyncio.sleep(delay)
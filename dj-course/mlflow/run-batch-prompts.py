@@ -0,0 +1,186 @@
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from contextlib import nullcontext
+from datetime import datetime
+from dotenv import load_dotenv
+from llm_cache import LLMCache
+from mlflow_sink import MlflowSink
+from providers import PROVIDER_MODULES, get_provider
+
+# Load environment variables from .env file
+load_dotenv()
+
+# --- Batch Configuration ---
+# Models, servers and retries of each provider are configured in providers/*.py
+BATCH_CONFIG = {
+    "concurrency": 8,  # requests in flight at the same time
+    "system_prompt": "You are a helpful AI assistant.",
+    "temperature": 0.7,
+    "max_tokens": 150,
+}
+
+# --- Batch pipeline ---
+# reader -> prompt queue -> `concurrency` workers -> result queue -> writer
+# The prompt queue is bounded, so the prompt file is read only as fast as the workers consume it
+async def read_prompts(prompts_file, prompt_queue, workers_number):
+    with open(prompts_file, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"prompt": record}
+            await prompt_queue.put({
+                "id": record.get("id", line_number),
+                "system": record.get("system", BATCH_CONFIG["system_prompt"]),
+                "prompt": record["prompt"],
+                "temperature": record.get("temperature", BATCH_CONFIG["temperature"]),
+                "max_tokens": record.get("max_tokens", BATCH_CONFIG["max_tokens"]),
+            })
+    for _ in range(workers_number):
+        await prompt_queue.put(None)
+
+# All workers share one provider (one async client with a pool of keep-alive connections) and one rate limiter
+# per model, so together they stay within its requests/min and tokens/min budget.
+# Rate limits and connection problems are retried, other errors are reported for the prompt
+async def worker(provider, model, cache, prompt_queue, result_queue):
+    while True:
+        request = await prompt_queue.get()
+        if request is None:
+            break
+
+        result = {"id": request["id"], "prompt": request["prompt"]}
+        start = time.perf_counter()
+        try:
+            completion = await provider.complete_async(
+                request["prompt"],
+                system=request["system"],
+                temperature=request["temperature"],
+                max_tokens=request["max_tokens"],
+                model=model,
+                cache=cache,
+            )
+            result.update(completion.to_dict(), response=completion.text, status="ok")
+            del result["text"]
+        except Exception as e:
+            # Time spent on a failed prompt (limiter, all attempts, backoff) - not a model latency
+            result.update(model=model or provider.config["model"], status="error", error=str(e),
+                          elapsed_seconds=time.perf_counter() - start)
+        await result_queue.put(result)
+
+# Results are written as soon as they arrive (in completion order), one JSON object per line.
+# Latency statistics cover only real model calls (not failures or cache hits); time spent waiting for the rate
+# limiter and retries is counted separately. With a sink, the latency, wait and tokens of every answered prompt
+# are logged as MLflow metrics (step = prompt number); the sink only queues them, the HTTP requests are made
+# in bulk by its own thread
+async def write_results(output_file, result_queue, stats, sink=None):
+    with open(output_file, "w", encoding="utf-8") as f:
+        while True:
+            result = await result_queue.get()
+            if result is None:
+                break
+            f.write(json.dumps(result, ensure_ascii=False) + "\n")
+            f.flush()
+
+            stats["ok" if result["status"] == "ok" else "failed"] += 1
+            # Cached responses cost no tokens
+            called = result["status"] == "ok" and not result["cached"]
+            if called:
+                stats["latencies"].append(result["latency"])
+                stats["wait_seconds"] += result["wait_seconds"]
+                for key in ("prompt_tokens", "completion_tokens", "total_tokens"):
+                    stats[key] += result[key]
+            done = stats["ok"] + stats["failed"]
+            if sink is not None and called:
+                sink.log_metrics({"prompt_latency_seconds": result["latency"],
+                                  "prompt_wait_seconds": result["wait_seconds"],
+                                  "prompt_total_tokens": result["total_tokens"]}, step=done)
+            if done % 100 == 0:
+                print(f"⏳ {done} prompts done ({stats['failed']} failed)")
+
+async def run_batch(provider, prompts_file, output_file, concurrency, model=None, cache=None, sink=None):
+    prompt_queue = asyncio.Queue(maxsize=4 * concurrency)
+    result_queue = asyncio.Queue()
+    stats = {"ok": 0, "failed": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0, "latencies": [],
+             "wait_seconds": 0.0}
+
+    writer = asyncio.create_task(write_results(output_file, result_queue, stats, sink))
+    workers = [asyncio.create_task(worker(provider, model, cache, prompt_queue, result_queue)) for _ in range(concurrency)]
+    await read_prompts(prompts_file, prompt_queue, concurrency)
+    await asyncio.gather(*workers)
+    await result_queue.put(None)
+    await writer
+    return stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a batch of prompts concurrently and track it in MLflow")
+    parser.add_argument("prompts", help='JSONL file, one {"prompt": ..., "id"?, "system"?, "temperature"?, "max_tokens"?} per line')
+    parser.add_argument("--provider", choices=sorted(PROVIDER_MODULES), default="openai")
+    parser.add_argument("--model", help="override the provider's default model")
+    parser.add_argument("--concurrency", type=int, default=BATCH_CONFIG["concurrency"])
+    parser.add_argument("--no-cache", action="store_true", help="always call the provider, ignore cached responses")
+    parser.add_argument("--output", help="results JSONL file (default: results-<provider>-<timestamp>.jsonl)")
+    args = parser.parse_args()
+
+    provider = get_provider(args.provider)
+    config = {**provider.config, "model": args.model or provider.config["model"]}
+    output_file = args.output or f"results-{args.provider}-{datetime.now():%Y%m%d-%H%M%S}.jsonl"
+
+    # --- MLflow Configuration ---
+    # Imported here, so --help and argument errors do not pay for loading mlflow
+    import mlflow
+    mlflow.set_tracking_uri("http://127.0.0.1:5000/")
+    mlflow.set_experiment(f"DJ_batch_prompts_{config['engine']}")
+
+    cache = None if args.no_cache else LLMCache()
+
+    # The sink sends params, metrics and artifacts in bulk from a background thread (or spools them when the
+    # tracking server is down); leaving the block - also after an error or Ctrl-C - flushes it and closes the cache
+    with cache or nullcontext(), mlflow.start_run() as run, MlflowSink(run.info.run_id) as sink:
+        print(f"Tracking started in MLflow Run ID: {run.info.run_id}")
+        print(f"Using model: {config['model']} ({config['engine']}), concurrency: {args.concurrency}")
+        print("-" * 50)
+        sink.log_params({
+            "engine": config["engine"],
+            "model": config["model"],
+            "prompts_file": args.prompts,
+            "concurrency": args.concurrency,
+            "max_retries": config["max_retries"],
+        })
+
+        start = time.perf_counter()
+        stats = asyncio.run(run_batch(provider, args.prompts, output_file, args.concurrency, args.model, cache, sink))
+        wall_time = time.perf_counter() - start
+
+        latencies = sorted(stats["latencies"])
+        done = stats["ok"] + stats["failed"]
+        metrics = {
+            "prompts_ok": stats["ok"],
+            "prompts_failed": stats["failed"],
+            "wall_time_seconds": wall_time,
+            "prompts_per_second": done / wall_time if wall_time > 0 else 0.0,
+            "prompt_tokens": stats["prompt_tokens"],
+            "completion_tokens": stats["completion_tokens"],
+            "total_tokens": stats["total_tokens"],
+            "wait_seconds_total": stats["wait_seconds"],
+        }
+        if latencies:
+            metrics["latency_mean_seconds"] = statistics.fmean(latencies)
+            metrics["latency_p50_seconds"] = latencies[int(0.50 * (len(latencies) - 1))]
+            metrics["latency_p95_seconds"] = latencies[int(0.95 * (len(latencies) - 1))]
+        if cache is not None:
+            metrics.update(cache.stats())
+        sink.log_metrics(metrics)
+        sink.log_artifact(output_file)
+
+        print(f"\n✅ {stats['ok']}/{done} prompts succeeded in {wall_time:.1f} s "
+              f"({metrics['prompts_per_second']:.2f} prompts/s)")
+        print(f"📊 Tokens used - Prompt: {stats['prompt_tokens']}, Completion: {stats['completion_tokens']}, Total: {stats['total_tokens']}")
+        if cache is not None:
+            print(f"💾 Cache hits: {cache.hits}/{cache.hits + cache.misses}, saved {cache.saved_seconds:.1f} s of model calls")
+        print(f"📝 Results written to {output_file}")
+        print(f"🏃 View run at: http://127.0.0.1:5000/#/experiments/{run.info.experiment_id}/runs/{run.info.run_id}")
@@ -1,24 +1,17 @@
-import mlflow
-from openai import OpenAI
-import os
+from llm_cache import LLMCache
+from mlflow_sink import MlflowSink
+from providers import get_provider
 
 # --- OpenAI Client Configuration (for local server communication) ---
+# The local servers (LLAMA_CPP_SERVER / OLLAMA_SERVER) are configured in providers/local_provider.py.
 # An API key is not strictly needed, but the client requires a Base URL to be passed
-# The Base URL points to the locally running Llama.cpp server
-
-LLAMA_CPP_SERVER = {
-    "engine": "llama-cpp",
-    "model": "whatever-model", # 🔥🔥🔥 tu nie ma różnicy co wpiszesz, bo na tym URLu jest tylko 1 model
-    "base_url": "http://localhost:8080/v1",
-}
-OLLAMA_SERVER = {
-    "engine": "ollama",
-    "model": "mistral", # 🔥🔥🔥 tu JEST różnica, bo ollama ma wiele modeli, a llama-cpp ma tylko 1 model
-    "base_url": "http://localhost:11434/v1",
-}
-SERVER = OLLAMA_SERVER
+provider = get_provider("ollama")  # or get_provider("llama-cpp")
+SERVER = provider.config
 
 # --- MLflow Configuration ---
+# Imported after the provider is set up, like the SDKs in providers/
+import mlflow
+
 # Enable automatic logging for OpenAI calls
 # This will work because the local server is compatible with the OpenAI API
 mlflow.openai.autolog()
@@ -27,29 +20,30 @@ mlflow.set_tracking_uri("http://127.0.0.1:5000/")
 # Set the MLflow experiment
 mlflow.set_experiment(f"DJ_local_model_tracking_{SERVER['engine']}")
 
-client = OpenAI(
-    base_url=SERVER["base_url"],
-    api_key="sk-not-needed",
-)
+# Identical requests are answered from the local response cache (shared with the other run-*.py scripts).
+# Cached responses do not reach the server, so autolog records no Trace for them
+cache = LLMCache()
 
 # --- Perform Inference and Tracking ---
-with mlflow.start_run() as run:
+# The sink sends params, metrics and artifacts in bulk from a background thread (or spools them when the
+# tracking server is down); leaving the block - also after an error or Ctrl-C - flushes it and closes the cache
+with cache, mlflow.start_run() as run, MlflowSink(run.info.run_id) as sink:
     print(f"Tracking started in MLflow Run ID: {run.info.run_id}")
 
     # Model call
     try:
-        completion = client.chat.completions.create(
-            model=SERVER["model"],
-            messages=[
-                {"role": "system", "content": "You are a helpless AI assistant."},
-                {"role": "user", "content": "Write a short note on why it is worth using MLflow."},
-            ],
+        result = provider.complete(
+            "Write a short note on why it is worth using MLflow.",
+            system="You are a helpless AI assistant.",
             temperature=0.7,
             max_tokens=150,
+            cache=cache,
         )
 
         # Retrieve and display the response
-        response_text = completion.choices[0].message.content
+        response_text = result.text
+        if result.cached:
+            print("\n💾 Response served from the local cache")
         print("\n--- Model Response ---")
         print(response_text)
         print("------------------------")
@@ -58,7 +52,8 @@ with mlflow.start_run() as run:
         print(f"Error connecting to the model: {e}")
         print(f"Make sure the {SERVER['engine']}.server is running at {SERVER['base_url']}.")
 
+    sink.log_metrics(cache.stats())
+
     # The interaction data (prompt, response, parameters, tokens) is now
     # automatically logged as a 'Trace' in MLflow thanks to autologging.
     print(f"\nThe Trace is available in the MLflow UI in the 'Traces' section for Run ID: {run.info.run_id}")
-